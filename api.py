@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+from collections import namedtuple
+from datetime import date
+
+import availability
+import bays
+import board
+import cards
+import db
+import events
+import rollups
+import schema
+
+# --- HEADLESS JSON API ---
+# A stdlib asyncio HTTP/1.1 server for flight-board TVs, kiosks and phones, sharing the
+# Streamlit app's database and data modules. Every endpoint pairs a cheap version read
+# (a meta counter or MAX(id), one primary-key lookup) with a builder. The version drives
+# the ETag, so a matching If-None-Match gets a 304 without building anything, and the
+# JSON body is cached per (endpoint, params, version). Clients long-poll by sending
+# their ETag with ?wait=<seconds>: the request is held until the version moves or the
+# wait runs out (304). Version reads are shared by every waiter on the same resource,
+# so a wall of screens costs one query per POLL_INTERVAL. Builders run in worker
+# threads on the pooled readers; writes stay with the Streamlit app.
+HOST = os.environ.get("RIDEBOSS_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("RIDEBOSS_API_PORT", "8600"))
+TOKEN = os.environ.get("RIDEBOSS_API_TOKEN")
+POLL_INTERVAL = 0.5
+MAX_WAIT = 60
+MAX_HEADER_BYTES = 16384
+NOTIFICATION_LIMIT = 20
+
+Endpoint = namedtuple("Endpoint", "version build")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _meta(key):
+    row = db.fetchone("SELECT value FROM meta WHERE key=?", (key,))
+    return row[0] if row else 0
+
+
+def _max_id(table):
+    return db.fetchone(f"SELECT MAX(id) FROM {table}")[0] or 0
+
+
+# --- ENDPOINTS ---
+def _bays(params):
+    with db.reader() as con:
+        cur = con.execute('''SELECT plate, status, staff, vehicle_type, service_detail, entry_time, stage_time
+                             FROM live_bays ORDER BY entry_time''')
+        cols = [d[0] for d in cur.description]
+        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    # Elapsed time is left to the client so the body only changes when the board does.
+    return {"sla_minutes": bays.SLA_MINUTES, "bays": rows}
+
+
+def _free_staff(params):
+    return availability.free_staff_by_dept()
+
+
+def _notifications(params):
+    df = events.page(limit=_limit(params), flush_buffer=False)
+    return df.rename(columns=str.lower).to_dict("records")
+
+
+def _totals(params):
+    day = _day(params)
+    out = rollups.totals(day, day)
+    out["CARDS"] = cards.sales_between(f"{day} 00:00:00", f"{day} 23:59:59")
+    return {"day": day, "totals": out}
+
+
+def _limit(params):
+    try:
+        return max(1, min(int(params.get("limit", NOTIFICATION_LIMIT)), 200))
+    except ValueError:
+        raise BadRequest("limit must be a whole number")
+
+
+def _day(params):
+    if "day" not in params:
+        return date.today().isoformat()
+    try:
+        return date.fromisoformat(params["day"]).isoformat()
+    except ValueError:
+        raise BadRequest("day must be YYYY-MM-DD")
+
+
+ENDPOINTS = {
+    "/api/bays": Endpoint(lambda p: board.revision(), _bays),
+    "/api/staff/free": Endpoint(lambda p: (board.revision(), _meta("config_version")), _free_staff),
+    "/api/notifications": Endpoint(lambda p: (_max_id("notifications"), _limit(p)), _notifications),
+    "/api/totals": Endpoint(lambda p: (_day(p), _max_id("sales"), _max_id("expenses"), _max_id("card_ledger")), _totals),
+}
+
+# (path, query) -> (monotonic time, version); shared by every waiter on that resource.
+_versions = {}
+# (path, query) -> (version, etag, body)
+_bodies = {}
+
+
+def _key(path, params):
+    return path, tuple(sorted(params.items()))
+
+
+def _etag(key, version):
+    return '"' + hashlib.sha1(repr((key, version)).encode()).hexdigest()[:20] + '"'
+
+
+async def current_version(path, params, max_age=POLL_INTERVAL):
+    key = _key(path, params)
+    seen = _versions.get(key)
+    now = time.monotonic()
+    if seen and now - seen[0] < max_age:
+        return seen[1]
+    version = await asyncio.to_thread(ENDPOINTS[path].version, params)
+    if len(_versions) > 1024:
+        _versions.clear()
+    _versions[key] = (now, version)
+    return version
+
+
+async def body_for(path, params, version):
+    key = _key(path, params)
+    cached = _bodies.get(key)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+    data = await asyncio.to_thread(ENDPOINTS[path].build, params)
+    body = json.dumps(data, default=str, separators=(",", ":")).encode()
+    if len(_bodies) > 256:
+        _bodies.clear()
+    _bodies[key] = (version, _etag(key, version), body)
+    return _bodies[key][1], body
+
+
+async def respond(path, params, if_none_match, wait=0.0):
+    """(status, etag, body) for one GET, holding long-polls until the resource changes."""
+    key = _key(path, params)
+    version = await current_version(path, params, max_age=0)
+    if wait > 0 and if_none_match == _etag(key, version):
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            version = await current_version(path, params)
+            if if_none_match != _etag(key, version):
+                break
+    etag = _etag(key, version)
+    if if_none_match == etag:
+        return 304, etag, b""
+    return (200, *await body_for(path, params, version))
+
+
+# --- HTTP/1.1 ---
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def _response(status, body=b"", etag=None, keep_alive=True, head=False):
+    headers = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+               f"Content-Length: {len(body)}", "Cache-Control: no-cache", "Access-Control-Allow-Origin: *",
+               "Access-Control-Expose-Headers: ETag", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if etag:
+        headers.append(f"ETag: {etag}")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + (b"" if head else body)
+
+
+def _error(status, message, keep_alive=True):
+    return _response(status, json.dumps({"error": message}).encode(), keep_alive=keep_alive)
+
+
+async def handle(reader, writer):
+    try:
+        while True:
+            try:
+                raw = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(_error(400, "headers too large", keep_alive=False))
+                break
+            lines = raw.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_error(400, "bad request line", keep_alive=False))
+                break
+            headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+            url = urllib.parse.urlsplit(target)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            token = params.pop("token", None) or headers.get("authorization", "").removeprefix("Bearer ").strip()
+            try:
+                wait = min(float(params.pop("wait", 0)), MAX_WAIT)
+            except ValueError:
+                wait = 0.0
+
+            if method not in ("GET", "HEAD"):
+                writer.write(_error(405, "read-only API", keep_alive))
+            elif TOKEN and token != TOKEN:
+                writer.write(_error(401, "missing or wrong token", keep_alive))
+            elif url.path == "/api/health":
+                writer.write(_response(200, b'{"ok":true}', keep_alive=keep_alive, head=method == "HEAD"))
+            elif url.path not in ENDPOINTS:
+                writer.write(_error(404, f"unknown endpoint; try {', '.join(ENDPOINTS)}", keep_alive))
+            else:
+                try:
+                    status, etag, body = await respond(url.path, params, headers.get("if-none-match"), wait)
+                except BadRequest as e:
+                    writer.write(_error(400, str(e), keep_alive))
+                except Exception as e:  # a bad query must not take the server down
+                    writer.write(_error(500, str(e), keep_alive))
+                else:
+                    writer.write(_response(status, body, etag, keep_alive, head=method == "HEAD"))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, port=PORT):
+    server = await asyncio.start_server(handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f"RideBoss API on http://{host}:{port} ({', '.join(ENDPOINTS)})")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless JSON API for flight boards, kiosks and phones.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    schema.bootstrap()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,40 +1,32 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import sqlite3
 import urllib.parse
 import time
-import json
+import os
+import hashlib
+import uuid
+import archive
+import availability
+import bays
+import board
+import cache
+import cards
+import checkout
+import customers
+import db
+import diagnostics
+import events
+import export
+import receipts
+import reports
+import retention
+import rollups
+import schema
 
 # --- DATABASE SETUP ---
-conn = sqlite3.connect('rideboss_ultra.db', check_same_thread=False)
-c = conn.cursor()
-
-# Ensure all tables exist including the new Users and Membership tables
-c.execute('''CREATE TABLE IF NOT EXISTS users 
-             (username TEXT PRIMARY KEY, password TEXT, role TEXT, dept TEXT, status TEXT DEFAULT 'ACTIVE')''')
-c.execute('''CREATE TABLE IF NOT EXISTS customers 
-             (plate TEXT PRIMARY KEY, name TEXT, phone TEXT, visits INTEGER, last_visit TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS sales 
-             (id INTEGER PRIMARY KEY, plate TEXT, services TEXT, total REAL, method TEXT, staff TEXT, timestamp TEXT, type TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS notifications 
-             (id INTEGER PRIMARY KEY, message TEXT, timestamp TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS live_bays 
-             (plate TEXT PRIMARY KEY, status TEXT, entry_time TEXT, staff TEXT, vehicle_type TEXT, service_detail TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS inventory (item TEXT PRIMARY KEY, stock REAL, unit TEXT, price REAL)''')
-c.execute('''CREATE TABLE IF NOT EXISTS wash_prices (service TEXT PRIMARY KEY, price REAL)''')
-c.execute('''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY, description TEXT, amount REAL, timestamp TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS memberships 
-             (plate TEXT PRIMARY KEY, balance_washes INTEGER, card_type TEXT, sale_price REAL DEFAULT 0.0)''')
-
-# Seed Admin and Initial Data
-c.execute("INSERT OR IGNORE INTO users VALUES ('admin', '0000', 'MANAGER', 'MANAGEMENT', 'ACTIVE')")
-c.execute("INSERT OR IGNORE INTO inventory VALUES ('Car Shampoo', 10.0, 'Gallons', 0), ('Coke', 50.0, 'Cans', 500), ('Water', 100.0, 'Bottles', 200)")
-c.execute("SELECT COUNT(*) FROM wash_prices")
-if c.fetchone()[0] == 0:
-    initial_services = [("Standard Wash", 5000), ("Executive Detail", 15000), ("Engine Steam", 10000), ("Ceramic Wax", 25000), ("Interior Deep Clean", 12000)]
-    c.executemany("INSERT INTO wash_prices VALUES (?,?)", initial_services)
-conn.commit()
+schema.bootstrap()
+diagnostics.start_run()
 
 # --- CLASSIC UI STYLING ---
 st.set_page_config(page_title="RideBoss Autos HQ", layout="wide")
@@ -72,44 +64,43 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # --- SPECIAL PRINT RENDERER ---
+# ?receipt=<sale id> prints one stored receipt; ?receipts_day=YYYY-MM-DD prints a whole day.
+# Both need the &sig= from receipts.url()/day_url(): print tabs are not logged in.
 query_params = st.query_params
-if "print_receipt" in query_params:
-    receipt_data = json.loads(query_params["print_receipt"])
-    st.markdown(f"""
-        <style>
-            .stApp {{ background-color: white !important; color: black !important; }}
-            [data-testid="stSidebar"], .stButton, header {{ display: none !important; }}
-            .receipt-wrap {{ background: white; color: black; padding: 20px; font-family: 'Courier New', monospace; max-width: 400px; margin: auto; border: 1px solid #000; }}
-            .receipt-header {{ text-align: center; border-bottom: 2px dashed black; padding-bottom: 10px; }}
-            .receipt-total {{ border-top: 2px solid black; margin-top: 10px; font-weight: bold; font-size: 20px; }}
-        </style>
-        <div class="receipt-wrap">
-            <div class="receipt-header"><h2>RIDEBOSS AUTOS</h2><p>Premium Detailing</p></div>
-            <p><b>ID:</b> #RB{receipt_data['id']}</p>
-            <p><b>Date:</b> {receipt_data['date']}</p>
-            <p><b>Plate:</b> {receipt_data['plate']}</p>
-            <hr>
-            <p>{receipt_data['items']}</p>
-            <div class="receipt-total">TOTAL: ₦{receipt_data['total']:,}</div>
-            <p style="text-align:center; margin-top:20px;">*** THANK YOU ***</p>
-        </div>
-        <script>window.print();</script>
-    """, unsafe_allow_html=True)
+if "receipt" in query_params or "receipts_day" in query_params:
+    diagnostics.set_page("PRINT")
+    receipt_body, print_sig = None, query_params.get("sig")
+    if "receipt" in query_params:
+        receipt_id = query_params["receipt"]
+        if receipt_id.isdigit() and receipts.verify("receipt", int(receipt_id), print_sig):
+            receipt_body = receipts.render(int(receipt_id))
+    else:
+        receipt_day = query_params["receipts_day"][:10]
+        if receipts.verify("day", receipt_day, print_sig):
+            receipt_body = receipts.day_document(receipt_day)
+    if receipt_body:
+        st.markdown(receipts.print_page(receipt_body), unsafe_allow_html=True)
+    else:
+        st.error("Receipt not found.")
+    diagnostics.finish_run()
     st.stop()
 
 # --- UTILITIES ---
-def add_event(msg):
-    now = datetime.now().strftime("%H:%M:%S")
-    c.execute("INSERT INTO notifications (message, timestamp) VALUES (?,?)", (f"{now} | {msg}", now))
-    conn.commit()
+def add_event(msg, kind="SYSTEM", c=None):
+    # Pass the write cursor to log inside the business transaction; otherwise it is buffered.
+    events.log(msg, kind, c)
 
 def format_whatsapp(phone, message):
     return f"https://wa.me/{phone}?text={urllib.parse.quote(message)}"
 
+# Computed at most once per rerun for every department; the script namespace is fresh each run.
+_free_staff = None
+
 def get_free_staff_by_dept(dept_name):
-    busy_list = pd.read_sql_query("SELECT staff FROM live_bays", conn)['staff'].tolist()
-    all_dept = pd.read_sql_query(f"SELECT username FROM users WHERE dept='{dept_name}' AND status='ACTIVE'", conn)['username'].tolist()
-    return [s for s in all_dept if s not in busy_list]
+    global _free_staff
+    if _free_staff is None:
+        _free_staff = availability.free_staff_by_dept()
+    return _free_staff.get(dept_name, [])
 
 # --- LOGIN SYSTEM ---
 if 'logged_in' not in st.session_state: st.session_state.logged_in = False
@@ -117,14 +108,14 @@ if 'user_role' not in st.session_state: st.session_state.user_role = None
 if 'user_name' not in st.session_state: st.session_state.user_name = None
 
 if not st.session_state.logged_in:
+    diagnostics.set_page("LOGIN")
     st.markdown("<h1 style='text-align:center; letter-spacing:10px; margin-top:100px;'>RIDEBOSS LOGIN</h1>", unsafe_allow_html=True)
     _, log_col, _ = st.columns([1,1,1])
     with log_col:
         u = st.text_input("Username").strip()
         p = st.text_input("Password", type="password")
         if st.button("ACCESS SYSTEM"):
-            c.execute("SELECT role FROM users WHERE username=? AND password=?", (u, p))
-            result = c.fetchone()
+            result = db.fetchone("SELECT role FROM users WHERE username=? AND password=?", (u, p))
             if result:
                 st.session_state.logged_in = True
                 st.session_state.user_role = result[0]
@@ -132,27 +123,29 @@ if not st.session_state.logged_in:
                 st.rerun()
             else:
                 st.error("Invalid Username or Password")
+    diagnostics.finish_run()
     st.stop()
 
 # --- LOAD CONFIG ---
-wash_prices_df = pd.read_sql_query("SELECT * FROM wash_prices", conn)
-SERVICES = dict(zip(wash_prices_df['service'], wash_prices_df['price']))
+SERVICES = cache.services()
+BOARD_REFRESH_SECONDS = 3
+DOUBLE_CLICK_SECONDS = 3
 COUNTRY_CODES = {"Nigeria": "+234", "Ghana": "+233", "UK": "+44", "USA": "+1", "UAE": "+971"}
 
 # --- SIDEBAR NAVIGATION ---
 st.sidebar.markdown(f"USER: **{st.session_state.user_name}**")
 menu = ["COMMAND CENTER", "LIVE U-FLOW", "NOTIFICATIONS"]
 if st.session_state.user_role == "MANAGER":
-    menu += ["ONBOARD STAFF", "INVENTORY & STAFF", "FINANCIALS", "CRM & RETENTION"]
+    menu += ["ONBOARD STAFF", "INVENTORY & STAFF", "FINANCIALS", "CRM & RETENTION", "DIAGNOSTICS"]
 
 choice = st.sidebar.radio("NAVIGATE", menu)
+diagnostics.set_page(choice)
 if st.sidebar.button("LOGOUT"):
     st.session_state.logged_in = False
     st.rerun()
 
 # --- TOP NOTIFICATION FEED ---
-latest_note = pd.read_sql_query("SELECT message FROM notifications ORDER BY id DESC LIMIT 1", conn)
-st.markdown(f'<div class="notification-bar">SYSTEM LOG: {latest_note["message"].iloc[0] if not latest_note.empty else "READY"}</div>', unsafe_allow_html=True)
+st.markdown(f'<div class="notification-bar">SYSTEM LOG: {events.latest()}</div>', unsafe_allow_html=True)
 
 # --- 1. COMMAND CENTER ---
 if choice == "COMMAND CENTER":
@@ -162,19 +155,21 @@ if choice == "COMMAND CENTER":
         mode = st.radio("SELECT MODE", ["CAR WASH", "LOUNGE"], horizontal=True)
         st.markdown("---")
         
-        cust_data = pd.read_sql_query("SELECT * FROM customers", conn)
-        search_options = ["NEW CUSTOMER"] + [f"{r['plate']} - {r['name']} ({r['phone']})" for _, r in cust_data.iterrows()]
-        search_selection = st.selectbox("SEARCH EXISTING CLIENT", search_options)
-        
+        s_col1, s_col2 = st.columns([1, 2])
+        cust_query = s_col1.text_input("SEARCH EXISTING CLIENT", placeholder="Plate, name or phone")
+        search_options = ["NEW CUSTOMER"] + [f"{p} - {n} ({ph})" for p, n, ph in customers.search(cust_query)]
+        search_selection = s_col2.selectbox("MATCHES", search_options)
+
         d_plate, d_name, d_phone = "", "", ""
         if search_selection != "NEW CUSTOMER":
             p_key = search_selection.split(" - ")[0]
-            match = cust_data[cust_data['plate'] == p_key].iloc[0]
-            d_plate, d_name, d_phone = match['plate'], match['name'], match['phone']
+            match = customers.get(p_key)
+            if match:
+                d_plate, d_name, d_phone = match[0], match[1], match[2]
 
         col1, col2 = st.columns(2)
         with col1:
-            plate = st.text_input("PLATE NUMBER", value=d_plate).upper()
+            plate = customers.normalize_plate(st.text_input("PLATE NUMBER", value=d_plate))
             v_type = st.selectbox("VEHICLE TYPE", ["Sedan", "SUV", "Truck", "Crossover", "Bike", "Other"])
             name = st.text_input("CLIENT NAME", value=d_name)
             c_code = st.selectbox("COUNTRY CODE", list(COUNTRY_CODES.keys()))
@@ -193,11 +188,11 @@ if choice == "COMMAND CENTER":
                 staff_assigned = st.selectbox("ASSIGN WET BAY DETAILER", wet_staff if wet_staff else ["NO FREE STAFF"])
                 item_summary = ", ".join(selected)
             else:
-                inv_items = pd.read_sql_query("SELECT item, price FROM inventory WHERE price > 0", conn)
-                items_list = st.multiselect("SELECT ITEMS", inv_items['item'].tolist())
+                inv_items = cache.lounge_items()
+                items_list = st.multiselect("SELECT ITEMS", list(inv_items.keys()))
                 total_price = 0
                 for item in items_list:
-                    u_price = inv_items[inv_items['item'] == item]['price'].values[0]
+                    u_price = inv_items[item]['price']
                     qty = st.number_input(f"Quantity for {item}", min_value=1, value=1)
                     total_price += (u_price * qty)
                     lounge_items_sold.append((item, qty))
@@ -211,117 +206,89 @@ if choice == "COMMAND CENTER":
             if staff_assigned == "NO FREE STAFF" and mode == "CAR WASH":
                 st.error("Cannot authorize. No available staff in the Wet Bay.")
             elif (plate or mode == "LOUNGE") and (selected if mode=="CAR WASH" else lounge_items_sold):
-                can_proceed = True
-                low_bal = False
-                final_sales_total = total_price
-                
-                if pay_method == "Gold Card Credit":
-                    c.execute("SELECT balance_washes FROM memberships WHERE plate=?", (plate,))
-                    m_res = c.fetchone()
-                    if m_res and m_res[0] > 0:
-                        new_bal = m_res[0] - 1
-                        c.execute("UPDATE memberships SET balance_washes=? WHERE plate=?", (new_bal, plate))
-                        final_sales_total = 0.0
-                        if new_bal <= 1: low_bal = True
-                    else:
-                        st.error("No active card or zero balance for this plate.")
-                        can_proceed = False
-
-                if can_proceed:
-                    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-                    c.execute("INSERT INTO sales (plate, services, total, method, staff, timestamp, type) VALUES (?,?,?,?,?,?,?)", 
-                              (plate, item_summary, final_sales_total, pay_method, staff_assigned, now, mode))
-                    c.execute("INSERT OR REPLACE INTO customers (plate, name, phone, visits, last_visit) VALUES (?, ?, ?, COALESCE((SELECT visits FROM customers WHERE plate=?), 0) + 1, ?)", (plate, name, full_phone, plate, now.split()[0]))
-                    
-                    if mode == "CAR WASH":
-                        c.execute("INSERT OR REPLACE INTO live_bays (plate, status, entry_time, staff, vehicle_type, service_detail) VALUES (?, ?, ?, ?, ?, ?)", 
-                                  (plate, "WET BAY", now, staff_assigned, v_type, item_summary))
-                    else:
-                        for item, qty in lounge_items_sold:
-                            c.execute("UPDATE inventory SET stock = stock - ? WHERE item = ?", (qty, item))
-                    
-                    conn.commit()
-                    st.session_state['last_receipt'] = {
-                        "id": c.lastrowid, "mode": mode, "name": name, "plate": plate, "phone": full_phone,
-                        "items": item_summary, "total": final_sales_total, 
-                        "staff": staff_assigned, "date": now, "low_bal": low_bal
-                    }
-                    add_event(f"{mode} AUTH: {plate if plate else 'Lounge'} via {pay_method}")
+                # One nonce per checkout attempt: it survives an interrupted rerun (so the retry replays)
+                # and is rotated once a sale is recorded, so the next identical sale is a new sale.
+                # A second click on the same form right after a sale is a double-click and replays it.
+                # The detailer is left out: the sale itself takes them off the free list.
+                checkout_form = (mode, plate, item_summary, total_price, pay_method)
+                prev = st.session_state.get('last_receipt')
+                if prev and prev["form"] == checkout_form and time.time() - prev["at"] < DOUBLE_CLICK_SECONDS:
+                    checkout_key = prev["key"]
+                else:
+                    if 'checkout_nonce' not in st.session_state:
+                        st.session_state.checkout_nonce = uuid.uuid4().hex
+                    checkout_key = hashlib.sha1(repr((st.session_state.checkout_nonce,) + checkout_form).encode()).hexdigest()
+                try:
+                    result = checkout.authorize(checkout_key, mode, plate, name, full_phone, item_summary, total_price, pay_method,
+                                                staff_assigned, vehicle_type=v_type, lounge_items=lounge_items_sold)
+                except checkout.CheckoutError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state['last_receipt'] = {"id": result["sale_id"], "low_bal": result["low_bal"],
+                                                        "key": checkout_key, "form": checkout_form, "at": time.time()}
+                    if not result["replayed"]:
+                        st.session_state.checkout_nonce = uuid.uuid4().hex
                     st.rerun()
 
     with tab_mem:
         st.subheader("ACTIVATE MEMBERSHIP CARD")
-        m_plate = st.text_input("SCAN/ENTER PLATE FOR CARD").upper()
+        m_plate = customers.normalize_plate(st.text_input("SCAN/ENTER PLATE FOR CARD"))
         tier = st.selectbox("CARD TIER", ["Silver (5 Washes)", "Gold (10 Washes)", "Platinum (25 Washes)"])
         card_sale_price = st.number_input("CARD SALE PRICE (₦)", min_value=0.0)
         qty = 5 if "Silver" in tier else 10 if "Gold" in tier else 25
         
         if st.button("ISSUE CARD"):
             if m_plate:
-                c.execute("INSERT OR REPLACE INTO memberships (plate, balance_washes, card_type, sale_price) VALUES (?, ?, ?, ?)", (m_plate, qty, tier, card_sale_price))
-                conn.commit()
-                add_event(f"CARD ISSUED: {tier} to {m_plate}")
+                with db.write() as c:
+                    cards.issue(c, m_plate, tier, qty, card_sale_price, st.session_state.user_name)
+                    add_event(f"CARD ISSUED: {tier} to {m_plate}", "CARD", c)
                 st.success(f"Activated {tier} for {m_plate}!")
             else:
                 st.error("Plate number required.")
 
     if 'last_receipt' in st.session_state:
         r = st.session_state['last_receipt']
-        st.markdown(f"""
-        <div class="receipt-wrap" id="printable-receipt">
-            <div class="receipt-header"><h1>RIDEBOSS AUTOS</h1><p>Premium Detailing & Lounge</p><p>Phone: 09029557912</p></div>
-            <div class="receipt-body">
-                <div class="receipt-row"><span>Receipt ID:</span> <span>#RB{r['id']}</span></div>
-                <div class="receipt-row"><span>Date:</span> <span>{r['date']}</span></div>
-                <div class="receipt-row"><span>Plate:</span> <span>{r['plate']}</span></div>
-                <hr style="border:1px solid black">
-                <p><b>DESCRIPTION:</b></p><p>{r['items']}</p>
-                <div class="receipt-total"><span>TOTAL:</span><span>₦{r['total']:,}</span></div>
-            </div>
-            <div style="text-align:center;"><div class="receipt-stamp">RIDEBOSS OFFICIAL STAMP</div></div>
-        </div>
-        """, unsafe_allow_html=True)
-        
+        st.markdown(receipts.render(r['id']) or "", unsafe_allow_html=True)
+
         c_p1, c_p2 = st.columns(2)
         with c_p1:
-            if st.button("🖨️ PRINT RECEIPT"):
-                receipt_payload = { "id": r["id"], "date": r["date"], "plate": r["plate"], "items": r["items"], "total": r["total"] }
-                receipt_url = f"?print_receipt={urllib.parse.quote(json.dumps(receipt_payload))}"
-                st.markdown(f"<script>window.open('{receipt_url}', '_blank');</script>", unsafe_allow_html=True)
+            st.link_button("🖨️ PRINT RECEIPT", receipts.url(r['id']))
         with c_p2:
             if st.button("DONE"):
                 del st.session_state['last_receipt']
+                st.session_state.pop('checkout_nonce', None)
                 st.rerun()
 
 # --- 2. LIVE U-FLOW ---
 elif choice == "LIVE U-FLOW":
     view_mode = st.radio("VIEW MODE", ["Management controls", "External Flight Board"], horizontal=True)
-    live_cars = pd.read_sql_query("SELECT * FROM live_bays", conn)
-    
+
     if view_mode == "External Flight Board":
         st.markdown("<h1 style='text-align:center; color:#00d4ff;'>WORKFLOW MONITOR</h1>", unsafe_allow_html=True)
-        if live_cars.empty:
-            st.info("ALL BAYS CLEAR.")
-        else:
-            st.markdown('<div class="monitor-container"><div class="scroll-content">', unsafe_allow_html=True)
-            scroll_data = pd.concat([live_cars, live_cars])
-            for _, row in scroll_data.iterrows():
-                st.markdown(f"""
-                <div class="monitor-row">
-                    <div class="monitor-plate">{row['plate']} <br><span style="font-size:20px; color:#555;">{row['vehicle_type']}</span></div>
-                    <div style="flex:1; padding-left:40px;"><div class="monitor-svc">SERVICE: {row['service_detail']}</div></div>
-                    <div class="monitor-meta">
-                        <div class="monitor-status">{row['status']}</div>
-                        <div class="monitor-staff">ASSIGNED: {row['staff']}</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-            st.markdown('</div></div>', unsafe_allow_html=True)
+
+        # Only this fragment reruns on the timer; the payload is rebuilt only when the bays change.
+        @st.fragment(run_every=BOARD_REFRESH_SECONDS)
+        def flight_board():
+            _, board_payload = board.board_html()
+            if board_payload is None:
+                st.info("ALL BAYS CLEAR.")
+            else:
+                st.markdown(board_payload, unsafe_allow_html=True)
+
+        flight_board()
     else:
+        # Cheap watcher: reruns the page when a till or another manager changes the bays.
+        @st.fragment(run_every=BOARD_REFRESH_SECONDS)
+        def bay_watcher():
+            if board.revision() != st.session_state.bays_rev:
+                st.rerun()
+
+        st.session_state.bays_rev = board.revision()
+        live_cars = db.query_df("SELECT * FROM live_bays")
+        bay_watcher()
         for idx, row in live_cars.iterrows():
-            entry_dt = datetime.strptime(row['entry_time'], "%Y-%m-%d %H:%M")
-            time_spent = (datetime.now() - entry_dt).seconds // 60
-            border_color = "#00d4ff" if time_spent < 40 else "#FF3B30"
+            time_spent = bays.elapsed_minutes(row['entry_time'])
+            border_color = "#00d4ff" if time_spent < bays.SLA_MINUTES else "#FF3B30"
             st.markdown(f'<div class="status-card" style="border-left: 10px solid {border_color};">', unsafe_allow_html=True)
             c1, c2, c3 = st.columns([2, 2, 1])
             with c1:
@@ -338,15 +305,16 @@ elif choice == "LIVE U-FLOW":
                         new_dry_detailer = st.selectbox("Assign Dry Bay Detailer", dry_staff if dry_staff else ["NO FREE STAFF"], key=f"dry_{idx}")
                         if st.button("Confirm Handover", key=f"hnd_{idx}"):
                             if new_dry_detailer != "NO FREE STAFF":
-                                c.execute("UPDATE live_bays SET status='DRY BAY', staff=? WHERE plate=?", (new_dry_detailer, row['plate']))
-                                conn.commit(); add_event(f"{row['plate']} moved to Dry Bay under {new_dry_detailer}"); st.rerun()
+                                with db.write() as c:
+                                    bays.handover(c, row['plate'], new_dry_detailer)
+                                    add_event(f"{row['plate']} moved to Dry Bay under {new_dry_detailer}", "HANDOVER", c)
+                                st.rerun()
                             else: st.error("Assign a detailer first.")
                 if st.button(f"RELEASE {row['plate']}", key=f"rel_{idx}"):
-                    c.execute("SELECT name, phone FROM customers WHERE plate=?", (row['plate'],))
-                    cust_info = c.fetchone()
-                    c.execute("DELETE FROM live_bays WHERE plate=?", (row['plate'],))
-                    conn.commit()
-                    add_event(f"{row['plate']} Released.")
+                    cust_info = db.fetchone("SELECT name, phone FROM customers WHERE plate=?", (row['plate'],))
+                    with db.write() as c:
+                        bays.release(c, row['plate'])
+                        add_event(f"{row['plate']} Released.", "RELEASE", c)
                     if cust_info:
                         wa_msg = f"Hi {cust_info[0]}, your vehicle ({row['plate']}) is ready for pickup at RideBoss Autos. Thank you!"
                         wa_link = format_whatsapp(cust_info[1], wa_msg)
@@ -365,16 +333,20 @@ elif choice == "ONBOARD STAFF" and st.session_state.user_role == "MANAGER":
         s_dept = st.selectbox("Department", ["WET BAY", "DRY BAY", "RECEPTIONIST", "MANAGEMENT"])
         if st.form_submit_button("ONBOARD STAFF"):
             if s_name and s_pass:
-                c.execute("INSERT OR REPLACE INTO users (username, password, role, dept, status) VALUES (?,?,?,?,?)", (s_name, s_pass, s_role, s_dept, 'ACTIVE'))
-                conn.commit(); st.success(f"{s_name} added to {s_dept}."); st.rerun()
+                with db.write() as c:
+                    c.execute("INSERT OR REPLACE INTO users (username, password, role, dept, status) VALUES (?,?,?,?,?)", (s_name, s_pass, s_role, s_dept, 'ACTIVE'))
+                    cache.bump(c)
+                st.success(f"{s_name} added to {s_dept}."); st.rerun()
     st.write("---")
     st.subheader("CURRENT STAFF DIRECTORY")
-    current_staff_df = pd.read_sql_query("SELECT username, dept, role, status FROM users", conn)
+    current_staff_df = pd.DataFrame([{"username": u_name, **info} for u_name, info in cache.staff().items()], columns=["username", "dept", "role", "status"])
     st.dataframe(current_staff_df, use_container_width=True)
     target_staff = st.selectbox("Select Staff Member", ["None"] + current_staff_df['username'].tolist())
     if st.button("DEACTIVATE STAFF") and target_staff != "None":
-        c.execute("UPDATE users SET status='INACTIVE' WHERE username=?", (target_staff,))
-        conn.commit(); st.rerun()
+        with db.write() as c:
+            c.execute("UPDATE users SET status='INACTIVE' WHERE username=?", (target_staff,))
+            cache.bump(c)
+        st.rerun()
 
 # --- 4. INVENTORY & STAFF (MANAGER) ---
 elif choice == "INVENTORY & STAFF" and st.session_state.user_role == "MANAGER":
@@ -386,9 +358,11 @@ elif choice == "INVENTORY & STAFF" and st.session_state.user_role == "MANAGER":
             ni_unit = st.text_input("Unit")
             ni_price = st.number_input("Price (₦)", min_value=0.0)
             if st.form_submit_button("ADD/UPDATE"):
-                c.execute("INSERT OR REPLACE INTO inventory VALUES (?,?,?,?)", (ni_name, ni_stock, ni_unit, ni_price))
-                conn.commit(); st.rerun()
-        inv_data = pd.read_sql_query("SELECT * FROM inventory", conn)
+                with db.write() as c:
+                    c.execute("INSERT OR REPLACE INTO inventory VALUES (?,?,?,?)", (ni_name, ni_stock, ni_unit, ni_price))
+                    cache.bump(c)
+                st.rerun()
+        inv_data = pd.DataFrame([{"item": i_name, **info} for i_name, info in cache.inventory().items()], columns=["item", "stock", "unit", "price"])
         st.dataframe(inv_data, use_container_width=True)
     with t2:
         st.subheader("EDIT SERVICES & PRICES")
@@ -399,20 +373,35 @@ elif choice == "INVENTORY & STAFF" and st.session_state.user_role == "MANAGER":
             new_price = st.number_input("Service Price (₦)", value=0.0 if svc_to_edit == "-- ADD NEW --" else SERVICES[svc_to_edit])
             sub_col1, sub_col2 = st.columns(2)
             if sub_col1.form_submit_button("SAVE SERVICE"):
-                if svc_to_edit != "-- ADD NEW --" and new_name != svc_to_edit:
-                    c.execute("DELETE FROM wash_prices WHERE service=?", (svc_to_edit,))
-                c.execute("INSERT OR REPLACE INTO wash_prices VALUES (?,?)", (new_name, new_price))
-                conn.commit(); st.rerun()
+                with db.write() as c:
+                    if svc_to_edit != "-- ADD NEW --" and new_name != svc_to_edit:
+                        c.execute("DELETE FROM wash_prices WHERE service=?", (svc_to_edit,))
+                    c.execute("INSERT OR REPLACE INTO wash_prices VALUES (?,?)", (new_name, new_price))
+                    cache.bump(c)
+                st.rerun()
             if svc_to_edit != "-- ADD NEW --":
                 if sub_col2.form_submit_button("DELETE SERVICE"):
-                    c.execute("DELETE FROM wash_prices WHERE service=?", (svc_to_edit,))
-                    conn.commit(); st.rerun()
+                    with db.write() as c:
+                        c.execute("DELETE FROM wash_prices WHERE service=?", (svc_to_edit,))
+                        cache.bump(c)
+                    st.rerun()
     with t3:
-        perf_query = "SELECT staff, COUNT(*) as washes, SUM(total) as revenue FROM sales WHERE type='CAR WASH' GROUP BY staff"
-        perf_df = pd.read_sql_query(perf_query, conn)
+        perf_df = rollups.staff_performance("CAR WASH")
         st.bar_chart(perf_df.set_index('staff')['washes'])
         st.dataframe(perf_df, use_container_width=True)
 
+        st.markdown("#### BAY CYCLE TIMES")
+        cyc_staff, cyc_service, cyc_hour = st.tabs(["BY DETAILER", "BY SERVICE", "BY HOUR"])
+        with cyc_staff:
+            st.dataframe(bays.cycle_stats("staff"), use_container_width=True, hide_index=True)
+        with cyc_service:
+            st.dataframe(bays.cycle_stats("service"), use_container_width=True, hide_index=True)
+        with cyc_hour:
+            hourly_df = bays.hourly_throughput()
+            if not hourly_df.empty:
+                st.bar_chart(hourly_df.set_index('hour')['cars'])
+            st.dataframe(bays.cycle_stats("hour"), use_container_width=True, hide_index=True)
+
 # --- 5. FINANCIALS (ENHANCED TRANSPARENCY) ---
 elif choice == "FINANCIALS" and st.session_state.user_role == "MANAGER":
     st.subheader("FINANCIAL INTELLIGENCE CENTER")
@@ -421,44 +410,44 @@ elif choice == "FINANCIALS" and st.session_state.user_role == "MANAGER":
     with tab_fin:
         # 1. TIME SELECTION LOGIC
         col_f1, col_f2 = st.columns([1, 2])
-        view_scope = col_f1.radio("REPORTING SCOPE", ["DAILY", "MONTHLY", "YEARLY"], horizontal=True)
-        
-        # Load raw data
-        sales_raw = pd.read_sql_query("SELECT * FROM sales", conn)
-        exp_raw = pd.read_sql_query("SELECT * FROM expenses", conn)
-        m_sales_raw = pd.read_sql_query("SELECT plate, card_type, sale_price, '2026-01-01' as timestamp FROM memberships", conn) # Card sales reference
-        
-        # Convert timestamps for filtering
-        sales_raw['timestamp'] = pd.to_datetime(sales_raw['timestamp'])
-        exp_raw['timestamp'] = pd.to_datetime(exp_raw['timestamp'])
-        
+        view_scope = col_f1.radio("REPORTING SCOPE", ["DAILY", "MONTHLY", "YEARLY", "CUSTOM", "SHIFT"], horizontal=True)
+
         now = datetime.now()
-        
+        years = reports.years_available()
+
         if view_scope == "DAILY":
             selected_date = col_f2.date_input("SELECT DAY", now.date())
-            f_sales = sales_raw[sales_raw['timestamp'].dt.date == selected_date]
-            f_exps = exp_raw[exp_raw['timestamp'].dt.date == selected_date]
+            start_ts, end_ts = reports.day_range(selected_date)
             label = f"REPORT FOR {selected_date}"
         elif view_scope == "MONTHLY":
             months = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-            selected_month_name = col_f2.selectbox("SELECT MONTH", months, index=now.month-1)
+            mc1, mc2 = col_f2.columns(2)
+            selected_month_name = mc1.selectbox("SELECT MONTH", months, index=now.month-1)
             selected_month = months.index(selected_month_name) + 1
-            f_sales = sales_raw[(sales_raw['timestamp'].dt.month == selected_month) & (sales_raw['timestamp'].dt.year == 2026)]
-            f_exps = exp_raw[(exp_raw['timestamp'].dt.month == selected_month) & (exp_raw['timestamp'].dt.year == 2026)]
-            label = f"REPORT FOR {selected_month_name} 2026"
-        else:
-            selected_year = col_f2.selectbox("SELECT YEAR", [2024, 2025, 2026], index=2)
-            f_sales = sales_raw[sales_raw['timestamp'].dt.year == selected_year]
-            f_exps = exp_raw[exp_raw['timestamp'].dt.year == selected_year]
+            selected_year = mc2.selectbox("SELECT YEAR", years, index=len(years)-1)
+            start_ts, end_ts = reports.month_range(selected_year, selected_month)
+            label = f"REPORT FOR {selected_month_name} {selected_year}"
+        elif view_scope == "YEARLY":
+            selected_year = col_f2.selectbox("SELECT YEAR", years, index=len(years)-1)
+            start_ts, end_ts = reports.year_range(selected_year)
             label = f"ANNUAL REPORT {selected_year}"
-
-        # 2. CALCULATE METRICS
-        rev_wash = f_sales[f_sales['type'] == 'CAR WASH']['total'].sum()
-        rev_lounge = f_sales[f_sales['type'] == 'LOUNGE']['total'].sum()
-        # Card sales logic: In this DB version card sales are stored in memberships. 
-        # For transparency, we show the sum of all cards active in the system.
-        card_total = m_sales_raw['sale_price'].sum() if view_scope != "DAILY" else 0 
-        total_exp = f_exps['amount'].sum()
+        elif view_scope == "CUSTOM":
+            picked = col_f2.date_input("SELECT RANGE", (now.date().replace(day=1), now.date()))
+            range_start, range_end = (picked[0], picked[-1]) if isinstance(picked, (list, tuple)) and picked else (picked, picked)
+            start_ts, end_ts = reports.custom_range(range_start, range_end)
+            label = f"REPORT {start_ts[:10]} TO {end_ts[:10]}"
+        else:
+            sc1, sc2 = col_f2.columns(2)
+            shift_date = sc1.date_input("SHIFT DAY", now.date())
+            shift_name = sc2.selectbox("SHIFT", list(reports.SHIFTS.keys()))
+            start_ts, end_ts = reports.shift_range(shift_date, shift_name)
+            label = f"{shift_name} SHIFT {start_ts[:16]} TO {end_ts[:16]}"
+
+        # 2. CALCULATE METRICS (from the daily rollups, not the raw rows)
+        period = reports.totals(start_ts, end_ts)
+        rev_wash, rev_lounge = period['CAR WASH'], period['LOUNGE']
+        card_total = cards.sales_between(start_ts, end_ts)
+        total_exp = period['EXPENSES']
         net_profit = (rev_wash + rev_lounge + card_total) - total_exp
 
         st.markdown(f"### {label}")
@@ -480,44 +469,177 @@ elif choice == "FINANCIALS" and st.session_state.user_role == "MANAGER":
         
         # 4. DATA TABLES & EXPORT
         st.subheader("Detailed Transaction Log")
+        f_sales = reports.sales_between(start_ts, end_ts)
         st.dataframe(f_sales, use_container_width=True)
         
-        csv = f_sales.to_csv(index=False).encode('utf-8')
-        st.download_button("📥 DOWNLOAD FILTERED REPORT (CSV)", csv, f"RideBoss_{view_scope}_{label}.csv", "text/csv")
+        # Exports stream from SQLite to a temp file in chunks instead of serialising a DataFrame.
+        x_col1, x_col2, x_col3 = st.columns(3)
+        export_kind = x_col1.selectbox("EXPORT DATA", list(export.QUERIES))
+        export_fmt = x_col2.selectbox("FORMAT", list(export.FORMATS))
+        if x_col3.button("PREPARE FILTERED REPORT"):
+            old_export = st.session_state.pop('export_file', None)
+            if old_export and os.path.exists(old_export[0]):
+                os.remove(old_export[0])
+            try:
+                x_path, x_rows = export.export_file(export_kind, export_fmt, start_ts, end_ts)
+                st.session_state['export_file'] = (x_path, f"RideBoss_{export_kind}_{view_scope}_{label}.{export_fmt}", export.FORMATS[export_fmt], x_rows)
+            except RuntimeError as e:
+                st.error(str(e))
+        if 'export_file' in st.session_state and os.path.exists(st.session_state['export_file'][0]):
+            x_path, x_name, x_mime, x_rows = st.session_state['export_file']
+            with open(x_path, 'rb') as x_fh:
+                st.download_button(f"📥 DOWNLOAD FILTERED REPORT ({x_rows:,} rows)", x_fh, x_name, x_mime)
+
+        with st.expander("REPRINT RECEIPTS"):
+            rp_col1, rp_col2 = st.columns(2)
+            reprint_id = rp_col1.number_input("RECEIPT ID (#RB...)", min_value=1, step=1)
+            rp_col1.link_button("🖨️ PRINT RECEIPT", receipts.url(reprint_id))
+            reprint_day = rp_col2.date_input("DAY", now.date(), key="reprint_day")
+            rp_col2.link_button("🖨️ PRINT ALL RECEIPTS FOR THE DAY", receipts.day_url(reprint_day))
+            # The day's document is only built on request, not on every FINANCIALS rerun.
+            if rp_col2.button("PREPARE DAY'S RECEIPTS (HTML)"):
+                day_doc = receipts.day_document(reprint_day)
+                st.session_state['receipts_doc'] = (reprint_day, receipts.print_page(day_doc) if day_doc else None)
+            if st.session_state.get('receipts_doc', (None,))[0] == reprint_day:
+                if st.session_state['receipts_doc'][1]:
+                    rp_col2.download_button("📥 DOWNLOAD DAY'S RECEIPTS (HTML)", st.session_state['receipts_doc'][1],
+                                            f"RideBoss_receipts_{reprint_day}.html", "text/html")
+                else:
+                    rp_col2.info("No receipts for that day.")
 
         with st.expander("LOG NEW EXPENSE"):
             e_desc = st.text_input("Description")
             e_amt = st.number_input("Amount", min_value=0.0)
             if st.button("LOG"):
-                c.execute("INSERT INTO expenses (description, amount, timestamp) VALUES (?,?,?)", (e_desc, e_amt, datetime.now().strftime("%Y-%m-%d")))
-                conn.commit(); st.rerun()
+                e_now = datetime.now().strftime(db.TS_FMT)
+                with db.write() as c:
+                    c.execute("INSERT INTO expenses (description, amount, timestamp) VALUES (?,?,?)", (e_desc, e_amt, e_now))
+                    rollups.record_expense(c, e_now, e_amt)
+                st.rerun()
 
     with tab_cards_hub:
-        m_df = pd.read_sql_query("SELECT * FROM memberships", conn)
-        for idx, row in m_df.iterrows():
-            with st.container():
-                c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
-                c1.write(f"**{row['plate']}** ({row['card_type']})")
-                c2.write(f"Bal: {row['balance_washes']} left")
-                if c3.button(f"TOP UP {row['plate']}", key=f"up_{idx}"):
-                    c.execute("UPDATE memberships SET balance_washes = 10 WHERE plate=?", (row['plate'],))
-                    conn.commit(); st.rerun()
-                if c4.button(f"DELETE {row['plate']}", key=f"del_{idx}"):
-                    c.execute("DELETE FROM memberships WHERE plate=?", (row['plate'],))
-                    conn.commit(); st.rerun()
-                st.markdown("---")
+        n_cards, n_live, n_washes = cards.counts()
+        h1, h2, h3 = st.columns(3)
+        h1.metric("CARDS", f"{n_cards:,}")
+        h2.metric("WITH BALANCE", f"{n_live:,}")
+        h3.metric("WASHES OUTSTANDING", f"{n_washes:,}")
+
+        # Keyset pagination by plate, one editable table per page instead of widgets per card.
+        hub_prefix = customers.normalize_plate(st.text_input("FILTER BY PLATE PREFIX"))
+        if st.session_state.get('hub_prefix') != hub_prefix:
+            st.session_state.hub_prefix = hub_prefix
+            st.session_state.hub_cursors = [None]
+        hub_cursors = st.session_state.hub_cursors
+        hub_df = cards.page(hub_cursors[-1], hub_prefix)
+        picked_df = st.data_editor(hub_df.assign(select=False), hide_index=True, use_container_width=True,
+                                   disabled=list(hub_df.columns), key=f"hub_{hub_prefix}_{len(hub_cursors)}")
+        picked = picked_df.loc[picked_df['select'], 'plate'].tolist()
+
+        p_col1, p_col2 = st.columns(2)
+        if len(hub_cursors) > 1 and p_col1.button("◀ PREVIOUS CARDS"):
+            hub_cursors.pop(); st.rerun()
+        if len(hub_df) == cards.PAGE_SIZE and p_col2.button("NEXT CARDS ▶"):
+            hub_cursors.append(hub_df['plate'].iloc[-1]); st.rerun()
+
+        st.markdown(f"#### ACTIONS ({len(picked)} SELECTED)")
+        a_col1, a_col2, a_col3 = st.columns(3)
+        topup_washes = a_col1.number_input("WASHES TO ADD", min_value=1, value=10)
+        topup_price = a_col2.number_input("TOP-UP PRICE PER CARD (₦)", min_value=0.0)
+        if a_col3.button("TOP UP SELECTED", disabled=not picked):
+            with db.write() as c:
+                n = cards.bulk_top_up(c, picked, topup_washes, topup_price, st.session_state.user_name)
+                add_event(f"CARDS TOPPED UP: {n} by {topup_washes} washes", "CARD", c)
+            st.rerun()
+        e_col1, e_col2, e_col3 = st.columns(3)
+        if e_col1.button("EXPIRE SELECTED", disabled=not picked):
+            with db.write() as c:
+                n = cards.expire(c, plates=picked, staff=st.session_state.user_name)
+                add_event(f"CARDS EXPIRED: {n}", "CARD", c)
+            st.rerun()
+        idle_days = e_col2.number_input("IDLE FOR (DAYS)", min_value=1, value=365)
+        if e_col3.button(f"EXPIRE ALL IDLE {idle_days}+ DAYS"):
+            with db.write() as c:
+                n = cards.expire(c, idle_days=idle_days, staff=st.session_state.user_name)
+                add_event(f"CARDS EXPIRED: {n} idle {idle_days}+ days", "CARD", c)
+            st.rerun()
+        if st.button("DELETE SELECTED", disabled=not picked):
+            with db.write() as c:
+                for p in picked:
+                    cards.delete(c, p, st.session_state.user_name)
+                add_event(f"CARDS DELETED: {', '.join(picked)}", "CARD", c)
+            st.rerun()
+        if len(picked) == 1:
+            st.markdown(f"#### LEDGER FOR {picked[0]}")
+            st.dataframe(cards.history(picked[0]), use_container_width=True, hide_index=True)
 
 # --- 6. CRM & NOTIFICATIONS ---
 elif choice == "CRM & RETENTION" and st.session_state.user_role == "MANAGER":
     st.subheader("RETENTION PANEL")
-    cust_df = pd.read_sql_query("SELECT * FROM customers", conn)
-    for idx, row in cust_df.iterrows():
-        last_v = datetime.strptime(row['last_visit'], "%Y-%m-%d")
-        days = (datetime.now() - last_v).days
-        color = "#00d4ff" if days < 14 else "#FF3B30"
-        st.markdown(f"<p style='color:{color};'><b>{row['name']}</b> ({row['plate']}) - {days} days since last visit</p>", unsafe_allow_html=True)
+    rfm_df = retention.rfm()
+    seg_counts = rfm_df['segment'].value_counts()
+    seg_cols = st.columns(len(retention.SEGMENTS))
+    for seg_col, seg_name in zip(seg_cols, retention.SEGMENTS):
+        seg_col.metric(seg_name, int(seg_counts.get(seg_name, 0)))
+
+    r_col1, r_col2, r_col3 = st.columns([2, 1, 1])
+    seg_filter = r_col1.multiselect("SEGMENTS", retention.SEGMENTS)
+    sort_by = r_col2.selectbox("SORT BY", ["recency_days", "frequency", "spend", "card_balance", "name"])
+    sort_desc = r_col3.radio("ORDER", ["DESC", "ASC"], horizontal=True) == "DESC"
+
+    view_df = rfm_df[rfm_df['segment'].isin(seg_filter)] if seg_filter else rfm_df
+    view_df = view_df.sort_values(sort_by, ascending=not sort_desc)
+    page_size = 50
+    page_count = max(1, -(-len(view_df) // page_size))
+    page_no = st.number_input(f"PAGE (of {page_count})", min_value=1, max_value=page_count, value=1)
+    st.dataframe(view_df.iloc[(page_no - 1) * page_size: page_no * page_size], use_container_width=True, hide_index=True)
+
+    export_df = view_df[['name', 'phone', 'plate', 'segment', 'recency_days']].assign(
+        whatsapp_link=[format_whatsapp(ph, msg) for ph, msg in zip(view_df['phone'], retention.whatsapp_messages(view_df))])
+    st.download_button(f"📥 EXPORT {len(export_df)} WHATSAPP PROMPTS (CSV)", export_df.to_csv(index=False).encode('utf-8'),
+                       "RideBoss_retention_whatsapp.csv", "text/csv")
+
+elif choice == "DIAGNOSTICS" and st.session_state.user_role == "MANAGER":
+    st.subheader("SYSTEM DIAGNOSTICS")
+    sizes = diagnostics.db_sizes()
+    d1, d2, d3, d4 = st.columns(4)
+    d1.metric("DATABASE", f"{sizes['db'] / 1e6:,.1f} MB")
+    d2.metric("WAL", f"{sizes['-wal'] / 1e6:,.1f} MB")
+    d3.metric("QUERY SAMPLES", f"{diagnostics.sample_count():,}")
+    diagnostics.SLOW_QUERY_MS = d4.number_input("SLOW QUERY THRESHOLD (ms)", min_value=1.0, value=float(diagnostics.SLOW_QUERY_MS))
+
+    st.markdown("#### PAGE SCRIPT TIME")
+    st.dataframe(diagnostics.page_stats(), use_container_width=True, hide_index=True)
+    st.markdown("#### TOP QUERIES (BY TOTAL TIME)")
+    st.dataframe(diagnostics.query_stats(), use_container_width=True, hide_index=True)
+    st.markdown("#### SLOW QUERY LOG")
+    st.dataframe(diagnostics.slow_queries(), use_container_width=True, hide_index=True)
+    with st.expander("RECENT RERUNS"):
+        st.dataframe(diagnostics.recent_runs(), use_container_width=True, hide_index=True)
+    with st.expander("ARCHIVED YEARS"):
+        st.caption("Closed years are moved out with `python archive.py archive --due`; reports read them back transparently.")
+        st.dataframe(archive.summary(), use_container_width=True, hide_index=True)
+    st.download_button("📥 EXPORT SAMPLES (JSON)", diagnostics.export_samples(), f"RideBoss_diagnostics_{datetime.now():%Y%m%d_%H%M}.json", "application/json")
 
 elif choice == "NOTIFICATIONS":
     st.subheader("SYSTEM HISTORY")
-    notes = pd.read_sql_query("SELECT timestamp as 'TIME', message as 'EVENT' FROM notifications ORDER BY id DESC", conn)
-    st.table(notes)
+    n_col1, n_col2 = st.columns([2, 1])
+    note_kinds = n_col1.multiselect("EVENT TYPE", events.KINDS)
+    note_days = n_col2.date_input("DATE RANGE", ())
+    note_start, note_end = reports.custom_range(note_days[0], note_days[-1]) if note_days else (None, None)
+
+    # Keyset pagination: each page starts below the last id of the one before it.
+    note_filter = (tuple(note_kinds), note_start, note_end)
+    if st.session_state.get('note_filter') != note_filter:
+        st.session_state.note_filter = note_filter
+        st.session_state.note_cursors = [None]
+    cursors = st.session_state.note_cursors
+    notes = events.page(cursors[-1], note_kinds, note_start, note_end)
+    st.table(notes.drop(columns=['id']))
+
+    p_col1, p_col2 = st.columns(2)
+    if len(cursors) > 1 and p_col1.button("◀ NEWER"):
+        cursors.pop(); st.rerun()
+    if len(notes) == events.PAGE_SIZE and p_col2.button("OLDER ▶"):
+        cursors.append(int(notes['id'].iloc[-1])); st.rerun()
+
+diagnostics.finish_run()
@@ -0,0 +1,262 @@
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import db
+
+# --- HOT / COLD TIERING ---
+# Closed years of sales, expenses, receipts and bay history move out of the hot database into one
+# archive file per year (<db name>_<year>.db under ARCHIVE_DIR). The `archives` table in
+# the hot database records what moved, with row counts and money totals. Queries that
+# span an archived year go through reader()/query_df(), which attach those files
+# read-only and expand {sales}-style placeholders into a UNION ALL over hot and cold.
+# The daily rollups are never archived, so whole-day FINANCIALS totals and Staff
+# Performance keep reading history without touching the archives.
+#
+# Moves are done in two transactions, one per file, because SQLite only commits
+# across attached databases atomically when the main one is not in WAL mode. Archive:
+# copy into the archive file (idempotent by id) and commit, then verify and delete
+# from hot. Restore: copy back and drop the registry rows, then remove the file.
+HOT_YEARS = int(os.environ.get("RIDEBOSS_HOT_YEARS", "2"))
+
+# table -> (timestamp column, money column or None)
+TABLES = {"sales": ("timestamp", "total"), "expenses": ("timestamp", "amount"), "bay_events": ("ts", None),
+          "receipts": ("ts", "total")}
+
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS archives
+       (year INTEGER, tbl TEXT, n INTEGER, total REAL, archived_at TEXT, PRIMARY KEY (year, tbl)) WITHOUT ROWID''',
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_dir():
+    return os.environ.get("RIDEBOSS_ARCHIVE_DIR") or os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "archive")
+
+
+def path_for(year):
+    stem = os.path.splitext(os.path.basename(db.DB_PATH))[0]
+    return os.path.join(archive_dir(), f"{stem}_{int(year)}.db")
+
+
+def _alias(year):
+    return f"arc_{int(year)}"
+
+
+def _bounds(year):
+    return f"{int(year)}-01-01 00:00:00", f"{int(year)}-12-31 23:59:59"
+
+
+def archived_years():
+    return [r[0] for r in db.fetchall("SELECT DISTINCT year FROM archives ORDER BY year")]
+
+
+def years_between(start=None, end=None):
+    """Archived years overlapping the inclusive [start, end] timestamp range."""
+    lo = int(start[:4]) if start else 0
+    hi = int(end[:4]) if end else 9999
+    return [y for y in archived_years() if lo <= y <= hi]
+
+
+# --- READING ACROSS TIERS ---
+def _columns(con, schema, table):
+    return [r[1] for r in con.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+
+def source(con, table, years):
+    """FROM-clause source for table: the hot table alone, or a UNION ALL with the archive years."""
+    if not years:
+        return table
+    cols = _columns(con, "main", table)
+    parts = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+    for year in years:
+        have = set(_columns(con, _alias(year), table))
+        if not have:
+            continue  # archived before this table existed
+        # Columns added to the hot table after the year was archived read as NULL.
+        picked = ", ".join(c if c in have else f"NULL AS {c}" for c in cols)
+        parts.append(f"SELECT {picked} FROM {_alias(year)}.{table}")
+    return "(" + " UNION ALL ".join(parts) + ")"
+
+
+@contextmanager
+def reader(start=None, end=None):
+    """db.reader() with the archives overlapping [start, end] attached; yields (con, sources)."""
+    years = years_between(start, end)
+    with db.reader({_alias(y): path_for(y) for y in years}) as con:
+        yield con, {t: source(con, t, years) for t in TABLES}
+
+
+def query_df(sql, start=None, end=None, params=()):
+    """Run sql with {sales}/{expenses}/{receipts}/{bay_events} placeholders expanded across hot and cold."""
+    with reader(start, end) as (con, sources):
+        return pd.read_sql_query(sql.format(**sources), con, params=params)
+
+
+def fetchall(sql, start=None, end=None, params=()):
+    with reader(start, end) as (con, sources):
+        return con.execute(sql.format(**sources), params).fetchall()
+
+
+# --- MOVES ---
+def _digest(c, schema, table, year, ids_from=None):
+    ts_col, money = TABLES[table]
+    sql = f"SELECT COUNT(*), {f'TOTAL({money})' if money else '0'} FROM {schema}.{table} WHERE {ts_col} BETWEEN ? AND ?"
+    if ids_from:
+        sql += f" AND id IN (SELECT id FROM {ids_from}.{table})"
+    n, total = c.execute(sql, _bounds(year)).fetchone()
+    return n, round(total, 2)
+
+
+def archive(year):
+    """Move one closed year from the hot tables into its archive file. Returns rows moved per table."""
+    year = int(year)
+    if year >= datetime.now().year:
+        raise ArchiveError(f"{year} is still open; only past years can be archived")
+    os.makedirs(archive_dir(), exist_ok=True)
+    alias, path = _alias(year), path_for(year)
+
+    # 1. Copy into the archive file and commit it before anything leaves hot.
+    with db.write({alias: path}) as c:
+        for table, (ts_col, _) in TABLES.items():
+            ddl = c.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+            c.execute(ddl.replace(f"CREATE TABLE {table}", f"CREATE TABLE IF NOT EXISTS {alias}.{table}", 1))
+            c.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_{table}_{ts_col} ON {table}({ts_col})")
+            cols = ", ".join(_columns(c, alias, table))
+            c.execute(f"INSERT OR REPLACE INTO {alias}.{table} ({cols}) SELECT {cols} FROM main.{table} "
+                      f"WHERE {ts_col} BETWEEN ? AND ?", _bounds(year))
+
+    # 2. Every hot row must now be present in the archive; only then delete it.
+    moved = {}
+    with db.write({alias: path}) as c:
+        for table, (ts_col, _) in TABLES.items():
+            hot = _digest(c, "main", table, year)
+            copied = _digest(c, "main", table, year, ids_from=alias)
+            if hot != copied:
+                raise ArchiveError(f"{table} {year}: hot {hot} but archive holds {copied}; nothing deleted")
+            c.execute(f"DELETE FROM main.{table} WHERE {ts_col} BETWEEN ? AND ?", _bounds(year))
+            n, total = _digest(c, alias, table, year)
+            c.execute('''INSERT OR REPLACE INTO archives (year, tbl, n, total, archived_at) VALUES (?,?,?,?,?)''',
+                      (year, table, n, total, datetime.now().strftime(db.TS_FMT)))
+            moved[table] = hot[0]
+    return moved
+
+
+def restore(year):
+    """Move an archived year back into the hot tables and remove its archive file."""
+    year = int(year)
+    alias, path = _alias(year), path_for(year)
+    if not os.path.exists(path):
+        raise ArchiveError(f"no archive file for {year} at {path}")
+    restored = {}
+    with db.write({alias: path}) as c:
+        for table in TABLES:
+            cols = _columns(c, alias, table)
+            listed = ", ".join(cols)
+            before = _digest(c, "main", table, year)
+            # Ids freed by archiving can be reused by new hot rows; those archived rows get fresh ids.
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS restore_clash (id INTEGER PRIMARY KEY)")
+            c.execute("DELETE FROM temp.restore_clash")
+            c.execute(f"INSERT INTO temp.restore_clash SELECT a.id FROM {alias}.{table} a JOIN main.{table} h ON h.id = a.id")
+            c.execute(f"INSERT INTO main.{table} ({listed}) SELECT {listed} FROM {alias}.{table} "
+                      f"WHERE id NOT IN (SELECT id FROM temp.restore_clash)")
+            rest = ", ".join(col for col in cols if col != "id")
+            c.execute(f"INSERT INTO main.{table} ({rest}) SELECT {rest} FROM {alias}.{table} "
+                      f"WHERE id IN (SELECT id FROM temp.restore_clash)")
+            after = _digest(c, "main", table, year)
+            cold = _digest(c, alias, table, year)
+            if (after[0] - before[0], round(after[1] - before[1], 2)) != cold:
+                raise ArchiveError(f"{table} {year}: restored {after} from {before} but archive holds {cold}; rolled back")
+            restored[table] = cold[0]
+        c.execute("DELETE FROM archives WHERE year=?", (year,))
+    os.remove(path)
+    return restored
+
+
+# --- INTEGRITY ---
+def check(year):
+    """List of problems with one archived year (empty when it is sound)."""
+    year = int(year)
+    path = path_for(year)
+    if not os.path.exists(path):
+        return [f"{year}: archive file {path} is missing"]
+    problems = []
+    with db.reader({_alias(year): path}) as con:
+        status = con.execute(f"PRAGMA {_alias(year)}.quick_check").fetchone()[0]
+        if status != "ok":
+            problems.append(f"{year}: quick_check reports {status}")
+        for table, n, total in con.execute("SELECT tbl, n, total FROM archives WHERE year=?", (year,)).fetchall():
+            cold = _digest(con, _alias(year), table, year)
+            if cold != (n, round(total, 2)):
+                problems.append(f"{year} {table}: registry says {n} rows / {total:,.2f}, file holds {cold[0]} / {cold[1]:,.2f}")
+        # Archived plus any late hot rows must still add up to what the rollups remember.
+        start_day, end_day = f"{year}-01-01", f"{year}-12-31"
+        sources = {t: source(con, t, [year]) for t in ("sales", "expenses")}
+        for table, rollup, money in (("sales", "sales_daily", "total"), ("expenses", "expenses_daily", "amount")):
+            n, total = con.execute(f"SELECT COUNT(*), TOTAL({money}) FROM {sources[table]} WHERE timestamp BETWEEN ? AND ?",
+                                   _bounds(year)).fetchone()
+            rn, rtotal = con.execute(f"SELECT COALESCE(SUM(n), 0), TOTAL({money}) FROM {rollup} WHERE day BETWEEN ? AND ?",
+                                     (start_day, end_day)).fetchone()
+            if (n, round(total, 2)) != (rn, round(rtotal, 2)):
+                problems.append(f"{year} {table}: {n} rows / {total:,.2f} on record but {rollup} has {rn} / {rtotal:,.2f}")
+    return problems
+
+
+def due():
+    """Closed years older than the HOT_YEARS window that still have rows in the hot tables."""
+    cutoff = datetime.now().year - HOT_YEARS + 1
+    years = set()
+    for table, (ts_col, _) in TABLES.items():
+        years.update(int(r[0]) for r in db.fetchall(
+            f"SELECT DISTINCT substr({ts_col}, 1, 4) FROM {table} WHERE {ts_col} < ?", (f"{cutoff}-01-01",)) if r[0])
+    return sorted(years)
+
+
+def summary():
+    """One row per archived year: rows and totals per table plus the file size."""
+    df = db.query_df("SELECT year, tbl, n, total, archived_at FROM archives ORDER BY year, tbl")
+    if df.empty:
+        return df
+    df["file_mb"] = [round(os.path.getsize(path_for(y)) / 1e6, 2) if os.path.exists(path_for(y)) else None for y in df["year"]]
+    return df
+
+
+if __name__ == "__main__":
+    import schema
+
+    parser = argparse.ArgumentParser(description="Move closed years between the hot database and yearly archive files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_archive = sub.add_parser("archive", help="archive one year, or every year due with --due")
+    p_archive.add_argument("year", type=int, nargs="?")
+    p_archive.add_argument("--due", action="store_true", help=f"archive every closed year outside the last {HOT_YEARS}")
+    p_archive.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards")
+    sub.add_parser("restore", help="bring an archived year back into the hot database").add_argument("year", type=int)
+    sub.add_parser("check", help="verify archived years (all when omitted)").add_argument("year", type=int, nargs="?")
+    sub.add_parser("list", help="show the archive registry")
+    args = parser.parse_args()
+    schema.bootstrap()
+
+    if args.command == "archive":
+        targets = due() if args.due else [args.year] if args.year else parser.error("give a year or --due")
+        for y in targets:
+            print(f"archived {y}: " + ", ".join(f"{t}={n:,}" for t, n in archive(y).items()))
+        if args.vacuum:
+            db.vacuum()
+            print("hot database vacuumed")
+    elif args.command == "restore":
+        print(f"restored {args.year}: " + ", ".join(f"{t}={n:,}" for t, n in restore(args.year).items()))
+    elif args.command == "check":
+        found = [p for y in ([args.year] if args.year else archived_years()) for p in check(y)]
+        for line in found:
+            print(f"PROBLEM {line}")
+        print("archives OK" if not found else f"{len(found)} problem(s)")
+        sys.exit(1 if found else 0)
+    else:
+        print(summary().to_string(index=False) if archived_years() else "nothing archived")
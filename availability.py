@@ -0,0 +1,18 @@
+import db
+
+# --- STAFF AVAILABILITY ---
+# A detailer is free when they are ACTIVE and not assigned to any live bay. One
+# anti-join answers that for every department at once, using the users(dept, status)
+# and live_bays(staff) indexes.
+FREE_STAFF_SQL = '''SELECT u.dept, u.username FROM users u
+                    WHERE u.status = 'ACTIVE'
+                      AND NOT EXISTS (SELECT 1 FROM live_bays b WHERE b.staff = u.username)
+                    ORDER BY u.dept, u.username'''
+
+
+def free_staff_by_dept():
+    """{dept: [username, ...]} of active staff with no car in a bay."""
+    free = {}
+    for dept, username in db.fetchall(FREE_STAFF_SQL):
+        free.setdefault(dept, []).append(username)
+    return free
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import db
+
+# --- BAY LIFECYCLE ---
+# live_bays only holds the current state of each car; bay_events keeps the append-only
+# history (ENTER, HANDOVER, RELEASE). Each stage that closes also folds its dwell time
+# into bay_cycle_stats, per staff, per service and per hour of entry. Cycle-time pages
+# then read a few hundred aggregate rows instead of replaying the history.
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS bay_events
+       (id INTEGER PRIMARY KEY, plate TEXT, event TEXT, staff TEXT, service_detail TEXT, vehicle_type TEXT, ts TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_bay_events_ts ON bay_events(ts)",
+    "CREATE INDEX IF NOT EXISTS idx_bay_events_plate ON bay_events(plate, id)",
+    '''CREATE TABLE IF NOT EXISTS bay_cycle_stats
+       (dim TEXT, key TEXT, stage TEXT, n INTEGER, total_secs REAL, max_secs REAL,
+        PRIMARY KEY (dim, key, stage)) WITHOUT ROWID''',
+    "ALTER TABLE live_bays ADD COLUMN stage_time TEXT",
+    "UPDATE live_bays SET stage_time = entry_time WHERE stage_time IS NULL",
+)
+
+SLA_MINUTES = 40
+
+
+def _parse(ts):
+    # entry_time predates db.TS_FMT on old rows ("%Y-%m-%d %H:%M"); fromisoformat reads both.
+    return datetime.fromisoformat(ts)
+
+
+def elapsed_minutes(ts, now=None):
+    return int(((now or datetime.now()) - _parse(ts)).total_seconds() // 60)
+
+
+def _log(c, plate, event, staff, service_detail, vehicle_type, ts):
+    c.execute('''INSERT INTO bay_events (plate, event, staff, service_detail, vehicle_type, ts)
+                 VALUES (?,?,?,?,?,?)''', (plate, event, staff, service_detail, vehicle_type, ts))
+
+
+def _fold(c, stage, secs, staff, service_detail, entered):
+    keys = [("hour", f"{_parse(entered).hour:02d}:00")]
+    keys += [("service", s.strip()) for s in (service_detail or "").split(",") if s.strip()]
+    if staff:
+        keys.append(("staff", staff))
+    c.executemany('''INSERT INTO bay_cycle_stats (dim, key, stage, n, total_secs, max_secs) VALUES (?,?,?,1,?,?)
+                     ON CONFLICT (dim, key, stage) DO UPDATE SET n = n + 1, total_secs = total_secs + excluded.total_secs,
+                     max_secs = MAX(max_secs, excluded.max_secs)''',
+                  [(dim, key, stage, secs, secs) for dim, key in keys])
+
+
+# --- TRANSITIONS (call inside db.write()) ---
+def enter(c, plate, staff, vehicle_type, service_detail, ts):
+    c.execute('''INSERT OR REPLACE INTO live_bays (plate, status, entry_time, staff, vehicle_type, service_detail, stage_time)
+                 VALUES (?, 'WET BAY', ?, ?, ?, ?, ?)''', (plate, ts, staff, vehicle_type, service_detail, ts))
+    _log(c, plate, "ENTER", staff, service_detail, vehicle_type, ts)
+
+
+def handover(c, plate, dry_staff):
+    row = c.execute("SELECT entry_time, stage_time, staff, service_detail, vehicle_type FROM live_bays WHERE plate=? AND status='WET BAY'",
+                    (plate,)).fetchone()
+    if row is None:
+        return False
+    entered, stage_start, wet_staff, service_detail, vehicle_type = row
+    now = datetime.now()
+    ts = now.strftime(db.TS_FMT)
+    c.execute("UPDATE live_bays SET status='DRY BAY', staff=?, stage_time=? WHERE plate=?", (dry_staff, ts, plate))
+    _log(c, plate, "HANDOVER", dry_staff, service_detail, vehicle_type, ts)
+    _fold(c, "WET", (now - _parse(stage_start or entered)).total_seconds(), wet_staff, service_detail, entered)
+    return True
+
+
+def release(c, plate):
+    row = c.execute("SELECT status, entry_time, stage_time, staff, service_detail, vehicle_type FROM live_bays WHERE plate=?",
+                    (plate,)).fetchone()
+    if row is None:
+        return False
+    status, entered, stage_start, staff, service_detail, vehicle_type = row
+    now = datetime.now()
+    ts = now.strftime(db.TS_FMT)
+    c.execute("DELETE FROM live_bays WHERE plate=?", (plate,))
+    _log(c, plate, "RELEASE", staff, service_detail, vehicle_type, ts)
+    _fold(c, "DRY" if status == "DRY BAY" else "WET", (now - _parse(stage_start or entered)).total_seconds(),
+          staff, service_detail, entered)
+    _fold(c, "TOTAL", (now - _parse(entered)).total_seconds(), None, service_detail, entered)
+    return True
+
+
+# --- ANALYTICS ---
+def cycle_stats(dim):
+    """Per key and stage: cars, average and worst dwell in minutes."""
+    return db.query_df('''SELECT key, stage, n AS cars, ROUND(total_secs / n / 60.0, 1) AS avg_mins,
+                                 ROUND(max_secs / 60.0, 1) AS max_mins
+                          FROM bay_cycle_stats WHERE dim=? ORDER BY key, stage''', (dim,))
+
+
+def hourly_throughput():
+    """Completed cycles by hour of entry with their average total time."""
+    return db.query_df('''SELECT key AS hour, n AS cars, ROUND(total_secs / n / 60.0, 1) AS avg_total_mins
+                          FROM bay_cycle_stats WHERE dim='hour' AND stage='TOTAL' ORDER BY key''')
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+# --- PAGE BENCHMARK HARNESS ---
+# For every data size the harness seeds (or reuses) a database, then a child process
+# pointed at it through RIDEBOSS_DB drives app.py with Streamlit's AppTest, timing each
+# menu page and the AUTHORIZE path. The JSON report can be compared against an earlier
+# one with --compare to flag regressions.
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "app.py")
+
+SIZES = {
+    "small": dict(years=1, sales_per_day=20, customers=2000, memberships=200, live_bays=10),
+    "medium": dict(years=2, sales_per_day=70, customers=10000, memberships=1000, live_bays=25),
+    "large": dict(years=3, sales_per_day=100, customers=20000, memberships=3000, live_bays=50),
+}
+PAGES = ["COMMAND CENTER", "LIVE U-FLOW", "NOTIFICATIONS", "ONBOARD STAFF", "INVENTORY & STAFF",
+         "FINANCIALS", "CRM & RETENTION", "DIAGNOSTICS"]
+REGRESSION_RATIO = 1.2
+
+
+def _stats(samples):
+    samples = sorted(samples)
+    return {"runs": len(samples), "median_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            "min_ms": round(samples[0], 2), "max_ms": round(samples[-1], 2)}
+
+
+def bench_pages(runs):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.session_state["logged_in"] = True
+    at.session_state["user_role"] = "MANAGER"
+    at.session_state["user_name"] = "admin"
+    at.run()
+    results = {}
+    for page in PAGES:
+        at.sidebar.radio[0].set_value(page).run()  # warm-up run lands on the page
+        samples = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            at.run()
+            samples.append((time.perf_counter() - t0) * 1000)
+        results[page] = _stats(samples)
+        if at.exception:
+            results[page]["error"] = str(at.exception[0].message)
+    return results
+
+
+def bench_authorize(runs):
+    import availability
+    import checkout
+    import db
+
+    plates = [r[0] for r in db.fetchall("SELECT plate FROM customers ORDER BY random() LIMIT ?", (runs * 2,))]
+    samples = {"CAR WASH": [], "LOUNGE": []}
+    for i in range(runs):
+        wet = availability.free_staff_by_dept().get("WET BAY") or ["admin"]
+        plate = plates[i % len(plates)] if plates else f"BENCH-{i}"
+        t0 = time.perf_counter()
+        checkout.authorize(uuid.uuid4().hex, "CAR WASH", plate, "Bench", "2348000000000", "Standard Wash",
+                           5000.0, "Cash", wet[0], vehicle_type="Sedan")
+        samples["CAR WASH"].append((time.perf_counter() - t0) * 1000)
+        db.execute("DELETE FROM live_bays WHERE plate=?", (plate,))
+        t0 = time.perf_counter()
+        checkout.authorize(uuid.uuid4().hex, "LOUNGE", "", "", "", "Water (x1)", 200.0, "Cash", "admin",
+                           lounge_items=[("Water", 1)])
+        samples["LOUNGE"].append((time.perf_counter() - t0) * 1000)
+    return {mode: _stats(s) for mode, s in samples.items()}
+
+
+def run_child(size, runs):
+    import db
+    import seed
+
+    counts = None
+    if not os.path.exists(db.DB_PATH):
+        counts = seed.seed(**SIZES[size])
+    report = {"seeded": counts, "rows": {t: db.fetchone(f"SELECT COUNT(*) FROM {t}")[0]
+                                         for t in ("sales", "customers", "memberships", "expenses", "notifications", "live_bays")}}
+    report["pages"] = bench_pages(runs)
+    report["authorize"] = bench_authorize(runs)
+    print(json.dumps(report))
+
+
+def compare(report, baseline):
+    regressions = []
+    for size, res in report["sizes"].items():
+        old = baseline.get("sizes", {}).get(size)
+        if not old:
+            continue
+        for group in ("pages", "authorize"):
+            for name, stats in res.get(group, {}).items():
+                before = old.get(group, {}).get(name)
+                if before and before["median_ms"] and stats["median_ms"] / before["median_ms"] > REGRESSION_RATIO:
+                    regressions.append(f"{size} / {name}: {before['median_ms']}ms -> {stats['median_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every RideBoss page and the AUTHORIZE path at several data sizes.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--runs", type=int, default=5, help="timed reruns per page")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "rideboss_bench"),
+                        help="where seeded databases are kept between runs")
+    parser.add_argument("--fresh", action="store_true", help="reseed databases even if they exist")
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", help="earlier report to check for regressions")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.runs)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {"generated": datetime.now().isoformat(timespec="seconds"), "runs": args.runs, "sizes": {}}
+    for size in args.sizes:
+        path = os.path.join(args.workdir, f"{size}.db")
+        if args.fresh:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        # A fresh interpreter per size keeps the in-process caches honest.
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", size, "--runs", str(args.runs)],
+                              env={**os.environ, "RIDEBOSS_DB": path}, cwd=HERE, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.exit(f"benchmark for {size} failed:\n{proc.stderr}")
+        report["sizes"][size] = json.loads(proc.stdout.strip().splitlines()[-1])
+        for page, stats in report["sizes"][size]["pages"].items():
+            print(f"{size:>6} {page:<18} median {stats['median_ms']:>9.1f}ms  p95 {stats['p95_ms']:>9.1f}ms")
+        for mode, stats in report["sizes"][size]["authorize"].items():
+            print(f"{size:>6} AUTHORIZE {mode:<8} median {stats['median_ms']:>9.1f}ms  p95 {stats['p95_ms']:>9.1f}ms")
+
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(report, json.load(fh))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
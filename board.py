@@ -0,0 +1,65 @@
+import html
+import threading
+
+import db
+
+# --- FLIGHT BOARD ---
+# meta.live_bays_rev is bumped by triggers on every live_bays change, so "has the board
+# changed?" is a single primary-key read. The rendered HTML is cached per revision and
+# shared by every screen in the process.
+DDL = (
+    "INSERT OR IGNORE INTO meta (key, value) VALUES ('live_bays_rev', 0)",
+    '''CREATE TRIGGER IF NOT EXISTS live_bays_rev_ai AFTER INSERT ON live_bays BEGIN
+           UPDATE meta SET value = value + 1 WHERE key = 'live_bays_rev';
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS live_bays_rev_au AFTER UPDATE ON live_bays BEGIN
+           UPDATE meta SET value = value + 1 WHERE key = 'live_bays_rev';
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS live_bays_rev_ad AFTER DELETE ON live_bays BEGIN
+           UPDATE meta SET value = value + 1 WHERE key = 'live_bays_rev';
+       END''',
+)
+
+ROW_HTML = '''<div class="monitor-row">
+    <div class="monitor-plate">{plate} <br><span style="font-size:20px; color:#555;">{vehicle_type}</span></div>
+    <div style="flex:1; padding-left:40px;"><div class="monitor-svc">SERVICE: {service_detail}</div></div>
+    <div class="monitor-meta">
+        <div class="monitor-status">{status}</div>
+        <div class="monitor-staff">ASSIGNED: {staff}</div>
+    </div>
+</div>'''
+
+_lock = threading.Lock()
+_cached = (None, None)
+
+
+def revision():
+    row = db.fetchone("SELECT value FROM meta WHERE key='live_bays_rev'")
+    return row[0] if row else 0
+
+
+def render(rows):
+    if not rows:
+        return None
+    body = "".join(ROW_HTML.format(**{k: html.escape(str(v)) for k, v in r.items()}) for r in rows)
+    # The list is repeated so the scroll animation loops without a gap.
+    return f'<div class="monitor-container"><div class="scroll-content">{body}{body}</div></div>'
+
+
+def board_html():
+    """(revision, html) for the current bays; html is None when every bay is clear."""
+    global _cached
+    rev = revision()
+    if _cached[0] == rev:
+        return _cached
+    with _lock:
+        if _cached[0] != rev:
+            with db.reader() as con:
+                con.execute("BEGIN")
+                rev = con.execute("SELECT value FROM meta WHERE key='live_bays_rev'").fetchone()[0]
+                cur = con.execute("SELECT plate, vehicle_type, service_detail, status, staff FROM live_bays ORDER BY entry_time")
+                cols = [d[0] for d in cur.description]
+                rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+                con.rollback()
+            _cached = (rev, render(rows))
+        return _cached
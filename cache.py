@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import namedtuple
+
+import db
+
+# --- CONFIG CACHE ---
+# Prices, the lounge catalogue and the staff roster change a few times a week but are
+# read on every rerun. They are loaded together into one in-process snapshot tagged with
+# meta.config_version. Writers call bump() inside their transaction: the counter moves
+# for every process, and this process drops its snapshot as soon as the write commits.
+# Other processes (importer, API) notice the new version within CHECK_INTERVAL seconds.
+# Live stock moves with every lounge sale, so it stays out of the snapshot and is read
+# fresh by inventory(); checkout reads it under the write lock.
+CHECK_INTERVAL = 30
+
+META_DDL = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+
+Config = namedtuple("Config", "version services inventory staff")
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def bump(c, key="config_version"):
+    c.execute('''INSERT INTO meta (key, value) VALUES (?, 1)
+                 ON CONFLICT (key) DO UPDATE SET value = value + 1''', (key,))
+    if key == "config_version":
+        db.after_commit(invalidate)
+
+
+def invalidate():
+    global _snapshot
+    _snapshot = None
+
+
+def _version(con):
+    row = con.execute("SELECT value FROM meta WHERE key='config_version'").fetchone()
+    return row[0] if row else 0
+
+
+def _load():
+    with db.reader() as con:
+        con.execute("BEGIN")  # one consistent snapshot across the four reads
+        version = _version(con)
+        services = dict(con.execute("SELECT service, price FROM wash_prices").fetchall())
+        inventory = {item: {"unit": unit, "price": price}
+                     for item, unit, price in con.execute("SELECT item, unit, price FROM inventory").fetchall()}
+        staff = {name: {"role": role, "dept": dept, "status": status}
+                 for name, role, dept, status in con.execute("SELECT username, role, dept, status FROM users").fetchall()}
+        con.rollback()
+    return Config(version, services, inventory, staff)
+
+
+def snapshot():
+    global _snapshot, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _snapshot is not None and now - _checked_at >= CHECK_INTERVAL:
+            with db.reader() as con:
+                if _version(con) != _snapshot.version:
+                    _snapshot = None
+            _checked_at = now
+        if _snapshot is None:
+            _snapshot = _load()
+            _checked_at = now
+        return _snapshot
+
+
+# --- LOOKUPS ---
+def services():
+    return snapshot().services
+
+
+def lounge_items():
+    return {item: row for item, row in snapshot().inventory.items() if row["price"] > 0}
+
+
+def inventory():
+    """The catalogue with current stock levels (stock is not cached)."""
+    stock = dict(db.fetchall("SELECT item, stock FROM inventory"))
+    return {item: {"stock": stock.get(item, 0), **row} for item, row in snapshot().inventory.items()}
+
+
+def staff():
+    return snapshot().staff
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta
+
+import db
+
+# --- MEMBERSHIP LEDGER ---
+# card_ledger is append-only: every issue, top-up, redeem, delete and expiry is one
+# dated row carrying the change in washes and the money taken. memberships keeps the
+# materialized balance and is updated in the same transaction, so the till reads one
+# row per card and FINANCIALS sums card revenue for any period with a range scan on
+# idx_card_ledger_ts (ts, amount). Bulk actions pass their plates as one JSON array and
+# run as two set-based statements.
+EVENTS = ["ISSUE", "TOPUP", "REDEEM", "DELETE", "EXPIRE", "IMPORT", "OPENING"]
+PAGE_SIZE = 50
+
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS card_ledger
+       (id INTEGER PRIMARY KEY, plate TEXT, event TEXT, washes INTEGER, amount REAL DEFAULT 0,
+        card_type TEXT, staff TEXT, ts TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_card_ledger_ts ON card_ledger(ts, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_card_ledger_plate ON card_ledger(plate, id)",
+    "ALTER TABLE memberships ADD COLUMN issued TEXT",
+    "ALTER TABLE memberships ADD COLUMN last_used TEXT",
+    # Cards sold before the ledger carry no date; they open the ledger on the migration day.
+    "UPDATE memberships SET issued = datetime('now', 'localtime') WHERE issued IS NULL",
+    '''INSERT INTO card_ledger (plate, event, washes, amount, card_type, ts)
+       SELECT plate, 'OPENING', balance_washes, COALESCE(sale_price, 0), card_type, issued FROM memberships''',
+    "CREATE INDEX IF NOT EXISTS idx_memberships_used ON memberships(COALESCE(last_used, issued))",
+)
+
+# The OPENING rows above booked each card's old sale price on the migration day. That
+# money was taken before the ledger existed, so the opening balance carries none.
+UNDATED_FIX = ("UPDATE card_ledger SET amount = 0 WHERE event = 'OPENING' AND amount != 0",)
+
+
+def _now():
+    return datetime.now().strftime(db.TS_FMT)
+
+
+def _post(c, plate, event, washes, amount=0.0, card_type=None, staff=None, ts=None):
+    c.execute('''INSERT INTO card_ledger (plate, event, washes, amount, card_type, staff, ts) VALUES (?,?,?,?,?,?,?)''',
+              (plate, event, washes, amount, card_type, staff, ts or _now()))
+
+
+# --- SINGLE-CARD ACTIONS (call inside db.write()) ---
+def issue(c, plate, card_type, washes, price, staff=None):
+    """Sell a card; an existing card on the plate keeps its balance and gains the washes."""
+    now = _now()
+    left = c.execute('''INSERT INTO memberships (plate, balance_washes, card_type, sale_price, issued) VALUES (?,?,?,?,?)
+                        ON CONFLICT (plate) DO UPDATE SET balance_washes = balance_washes + excluded.balance_washes,
+                        card_type = excluded.card_type, sale_price = excluded.sale_price, issued = excluded.issued
+                        RETURNING balance_washes''', (plate, washes, card_type, price, now)).fetchone()[0]
+    _post(c, plate, "ISSUE", washes, price, card_type, staff, now)
+    return left
+
+
+def top_up(c, plate, washes, price=0.0, staff=None):
+    row = c.execute("UPDATE memberships SET balance_washes = balance_washes + ? WHERE plate=? RETURNING balance_washes, card_type",
+                    (washes, plate)).fetchone()
+    if row is None:
+        return None
+    _post(c, plate, "TOPUP", washes, price, row[1], staff)
+    return row[0]
+
+
+def redeem(c, plate, staff=None):
+    """Take one wash off the card; None when there is no card or no balance left."""
+    # Conditional decrement: two tills redeeming the same card cannot both succeed on the last wash.
+    now = _now()
+    row = c.execute('''UPDATE memberships SET balance_washes = balance_washes - 1, last_used = ?
+                       WHERE plate=? AND balance_washes > 0 RETURNING balance_washes, card_type''', (now, plate)).fetchone()
+    if row is None:
+        return None
+    _post(c, plate, "REDEEM", -1, 0.0, row[1], staff, now)
+    return row[0]
+
+
+def delete(c, plate, staff=None):
+    row = c.execute("DELETE FROM memberships WHERE plate=? RETURNING balance_washes, card_type", (plate,)).fetchone()
+    if row is None:
+        return False
+    _post(c, plate, "DELETE", -(row[0] or 0), 0.0, row[1], staff)
+    return True
+
+
+# --- BULK ACTIONS (set-based) ---
+def bulk_top_up(c, plates, washes, price=0.0, staff=None):
+    now, picked = _now(), json.dumps(list(plates))
+    c.execute('''INSERT INTO card_ledger (plate, event, washes, amount, card_type, staff, ts)
+                 SELECT plate, 'TOPUP', ?, ?, card_type, ?, ? FROM memberships WHERE plate IN (SELECT value FROM json_each(?))''',
+              (washes, price, staff, now, picked))
+    c.execute("UPDATE memberships SET balance_washes = balance_washes + ? WHERE plate IN (SELECT value FROM json_each(?))",
+              (washes, picked))
+    return c.rowcount
+
+
+def expire(c, plates=None, idle_days=None, staff=None):
+    """Zero the balance of the given cards, or of every card unused for idle_days; returns cards expired."""
+    where, params = ["balance_washes > 0"], []
+    if plates is not None:
+        where.append("plate IN (SELECT value FROM json_each(?))"); params.append(json.dumps(list(plates)))
+    if idle_days is not None:
+        where.append("COALESCE(last_used, issued) < ?")
+        params.append((datetime.now() - timedelta(days=idle_days)).strftime(db.TS_FMT))
+    where = " AND ".join(where)
+    c.execute(f'''INSERT INTO card_ledger (plate, event, washes, amount, card_type, staff, ts)
+                  SELECT plate, 'EXPIRE', -balance_washes, 0, card_type, ?, ? FROM memberships WHERE {where}''',
+              [staff, _now()] + params)
+    c.execute(f"UPDATE memberships SET balance_washes = 0 WHERE {where}", params)
+    return c.rowcount
+
+
+# --- READERS ---
+def sales_between(start, end):
+    """Money taken for cards (issues and top-ups) in the inclusive timestamp range."""
+    return db.fetchone("SELECT TOTAL(amount) FROM card_ledger WHERE ts BETWEEN ? AND ?", (start, end))[0]
+
+
+def page(after_plate=None, prefix="", limit=PAGE_SIZE):
+    """One page of cards ordered by plate. Pass the last plate seen as after_plate for the next page."""
+    sql = "SELECT plate, card_type, balance_washes, issued, last_used FROM memberships WHERE plate > ?"
+    params = [after_plate or ""]
+    if prefix:
+        sql += " AND plate >= ? AND plate < ?"
+        params += [prefix, prefix + "\uffff"]
+    return db.query_df(sql + " ORDER BY plate LIMIT ?", params + [limit])
+
+
+def counts():
+    return db.fetchone("SELECT COUNT(*), COALESCE(SUM(balance_washes > 0), 0), COALESCE(SUM(balance_washes), 0) FROM memberships")
+
+
+def history(plate, limit=100):
+    return db.query_df('''SELECT ts, event, washes, amount, card_type, staff FROM card_ledger
+                          WHERE plate=? ORDER BY id DESC LIMIT ?''', (plate, limit))
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import bays
+import cards
+import customers
+import db
+import events
+import receipts
+import rollups
+
+# --- CHECKOUT ENGINE ---
+# One AUTHORIZE click is one BEGIN IMMEDIATE transaction: card credit, sale, receipt,
+# rollups, customer visit, bay entry or stock decrements and the event all commit together (one
+# fsync) or not at all. Every checkout carries an idempotency key; a repeated key
+# (double-click, retried request) returns the original sale instead of a new one.
+GOLD_CARD = "Gold Card Credit"
+KEY_TTL_DAYS = 2
+
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS checkouts
+       (key TEXT PRIMARY KEY, sale_id INTEGER, total REAL, low_bal INTEGER, created TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_checkouts_created ON checkouts(created)",
+)
+
+_pruned_on = None
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def authorize(key, mode, plate, name, phone, items, total, method, staff, vehicle_type=None, lounge_items=()):
+    """Record a sale; returns {"sale_id", "total", "low_bal", "timestamp", "replayed"}."""
+    now = datetime.now().strftime(db.TS_FMT)
+    with db.write() as c:
+        done = c.execute("SELECT sale_id, total, low_bal, created FROM checkouts WHERE key=?", (key,)).fetchone()
+        if done:
+            return {"sale_id": done[0], "total": done[1], "low_bal": bool(done[2]), "timestamp": done[3], "replayed": True}
+
+        low_bal = False
+        if method == GOLD_CARD:
+            left = cards.redeem(c, plate, staff)
+            if left is None:
+                raise CheckoutError("No active card or zero balance for this plate.")
+            total = 0.0
+            low_bal = left <= 1
+
+        if lounge_items:
+            # The write lock is held from BEGIN IMMEDIATE, so check-then-decrement cannot race.
+            names = [item for item, _ in lounge_items]
+            stock = dict(c.execute(f"SELECT item, stock FROM inventory WHERE item IN ({','.join('?' * len(names))})", names))
+            short = [item for item, qty in lounge_items if stock.get(item, 0) < qty]
+            if short:
+                raise CheckoutError(f"Not enough stock: {', '.join(short)}.")
+            c.executemany("UPDATE inventory SET stock = stock - ? WHERE item = ?", [(qty, item) for item, qty in lounge_items])
+
+        c.execute("INSERT INTO sales (plate, services, total, method, staff, timestamp, type) VALUES (?,?,?,?,?,?,?)",
+                  (plate, items, total, method, staff, now, mode))
+        sale_id = c.lastrowid
+        receipts.record(c, sale_id, now, mode, plate, name, phone, items, total, method, staff)
+        rollups.record_sale(c, now, mode, method, staff, total)
+        if plate:
+            customers.record_visit(c, plate, name, phone, now[:10])
+        if mode == "CAR WASH":
+            bays.enter(c, plate, staff, vehicle_type, items, now)
+        events.log(f"{mode} AUTH: {plate if plate else 'Lounge'} via {method}", "SALE", c)
+        c.execute("INSERT INTO checkouts (key, sale_id, total, low_bal, created) VALUES (?,?,?,?,?)",
+                  (key, sale_id, total, int(low_bal), now))
+        _prune_keys(c, now)
+    return {"sale_id": sale_id, "total": total, "low_bal": low_bal, "timestamp": now, "replayed": False}
+
+
+def _prune_keys(c, now):
+    global _pruned_on
+    if _pruned_on == now[:10]:
+        return
+    cutoff = (datetime.now() - timedelta(days=KEY_TTL_DAYS)).strftime(db.TS_FMT)
+    c.execute("DELETE FROM checkouts WHERE created < ?", (cutoff,))
+    _pruned_on = now[:10]
@@ -0,0 +1,102 @@
+import re
+
+import db
+
+# --- CUSTOMER SEARCH INDEX ---
+# customers_fts is a trigram FTS5 index over the compacted plate, the name and the
+# phone digits, so any 3+ character fragment ("KJA", "0803", "ade") is an indexed
+# lookup. Its rowid mirrors customers.rowid and triggers keep it in step. Shorter
+# queries fall back to a prefix range on the plate primary key.
+FTS_DDL = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(plate, name, phone, tokenize='trigram')''',
+    '''CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+           INSERT INTO customers_fts (rowid, plate, name, phone)
+           VALUES (new.rowid, replace(replace(new.plate, ' ', ''), '-', ''), new.name, replace(replace(new.phone, '+', ''), ' ', ''));
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+           DELETE FROM customers_fts WHERE rowid = old.rowid;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE OF plate, name, phone ON customers BEGIN
+           DELETE FROM customers_fts WHERE rowid = old.rowid;
+           INSERT INTO customers_fts (rowid, plate, name, phone)
+           VALUES (new.rowid, replace(replace(new.plate, ' ', ''), '-', ''), new.name, replace(replace(new.phone, '+', ''), ' ', ''));
+       END''',
+    '''INSERT INTO customers_fts (rowid, plate, name, phone)
+       SELECT rowid, replace(replace(plate, ' ', ''), '-', ''), name, replace(replace(phone, '+', ''), ' ', '') FROM customers''',
+)
+
+_fts_ready = None
+
+
+def fts_available():
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = db.fetchone("SELECT 1 FROM sqlite_master WHERE name='customers_fts'") is not None
+    return _fts_ready
+
+
+def create_index(c):
+    try:
+        c.execute("DROP TABLE IF EXISTS customers_fts")
+        for stmt in FTS_DDL:
+            c.execute(stmt)
+    except Exception as e:
+        # Builds without FTS5/trigram (SQLite < 3.34) keep the plate-prefix search.
+        if "fts5" not in str(e) and "tokenizer" not in str(e):
+            raise
+
+
+# --- PLATES ---
+def normalize_plate(plate):
+    """The one stored form of a plate: upper case, no whitespace ("kja 123 ab" -> "KJA123AB")."""
+    return re.sub(r"\s+", "", str(plate or "")).upper()
+
+
+def normalize_stored_plates(c):
+    """Rewrite every stored plate to normalize_plate(), merging customers and cards that collide."""
+    c.connection.create_function("norm_plate", 1, normalize_plate, deterministic=True)
+    for table in ("sales", "receipts", "card_ledger", "bay_events"):
+        c.execute(f"UPDATE {table} SET plate = norm_plate(plate) WHERE plate != norm_plate(plate)")
+    c.execute("UPDATE OR REPLACE live_bays SET plate = norm_plate(plate) WHERE plate != norm_plate(plate)")
+    c.execute('''INSERT INTO customers (plate, name, phone, visits, last_visit)
+                 SELECT norm_plate(plate), MAX(name), MAX(phone), SUM(COALESCE(visits, 0)), MAX(last_visit)
+                 FROM customers WHERE plate != norm_plate(plate) GROUP BY 1
+                 ON CONFLICT (plate) DO UPDATE SET name = COALESCE(NULLIF(name, ''), excluded.name),
+                 phone = COALESCE(NULLIF(phone, ''), excluded.phone), visits = COALESCE(visits, 0) + excluded.visits,
+                 last_visit = NULLIF(MAX(COALESCE(last_visit, ''), COALESCE(excluded.last_visit, '')), '')''')
+    c.execute("DELETE FROM customers WHERE plate != norm_plate(plate)")
+    c.execute('''INSERT INTO memberships (plate, balance_washes, card_type, sale_price, issued, last_used)
+                 SELECT norm_plate(plate), SUM(balance_washes), MAX(card_type), MAX(sale_price), MIN(issued), MAX(last_used)
+                 FROM memberships WHERE plate != norm_plate(plate) GROUP BY 1
+                 ON CONFLICT (plate) DO UPDATE SET balance_washes = balance_washes + excluded.balance_washes,
+                 last_used = NULLIF(MAX(COALESCE(last_used, ''), COALESCE(excluded.last_used, '')), '')''')
+    c.execute("DELETE FROM memberships WHERE plate != norm_plate(plate)")
+
+
+# --- QUERIES ---
+def search(query, limit=20):
+    """Top matches for a partial plate, name or phone as (plate, name, phone) tuples."""
+    terms = [re.sub(r"[^\w]", "", t) for t in query.split()]
+    # Phones are stored with the country code, so a local "0803..." searches as "803...".
+    terms = [t.lstrip("0") if t.isdigit() else t for t in terms]
+    terms = [t for t in terms if len(t) >= 3]
+    if terms and fts_available():
+        match = " AND ".join(f'"{t}"' for t in terms)
+        return db.fetchall('''SELECT c.plate, c.name, c.phone FROM customers_fts f
+                              JOIN customers c ON c.rowid = f.rowid
+                              WHERE customers_fts MATCH ? ORDER BY f.rank LIMIT ?''', (match, limit))
+    prefix = query.strip().upper()
+    if not prefix:
+        return []
+    return db.fetchall("SELECT plate, name, phone FROM customers WHERE plate >= ? AND plate < ? ORDER BY plate LIMIT ?",
+                       (prefix, prefix + "\uffff", limit))
+
+
+def get(plate):
+    return db.fetchone("SELECT plate, name, phone, visits, last_visit FROM customers WHERE plate=?", (plate,))
+
+
+def record_visit(c, plate, name, phone, day):
+    c.execute('''INSERT INTO customers (plate, name, phone, visits, last_visit) VALUES (?, ?, ?, 1, ?)
+                 ON CONFLICT (plate) DO UPDATE SET name=excluded.name, phone=excluded.phone,
+                 visits=COALESCE(visits, 0) + 1, last_visit=excluded.last_visit''', (plate, name, phone, day))
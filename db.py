@@ -0,0 +1,243 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- CONNECTION SETTINGS ---
+DB_PATH = os.environ.get("RIDEBOSS_DB", "rideboss_ultra.db")
+POOL_SIZE = int(os.environ.get("RIDEBOSS_DB_POOL", "8"))
+BUSY_TIMEOUT_MS = 5000
+
+# Sales and expenses are stamped with this fixed-width, lexically sortable format.
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=134217728",
+    # Lets REPLACE fire delete triggers so trigger-maintained indexes stay in step.
+    "PRAGMA recursive_triggers=ON",
+)
+
+
+# --- INSTRUMENTATION ---
+# With a recorder installed (diagnostics.py does this on import) every statement on a
+# pooled or writer connection reports {"sql", "ms", "rows"}. The same dict is updated in
+# place as rows are fetched, so SELECT timings include the fetch. Without a recorder the
+# cursor adds a single attribute check per call.
+_recorder = None
+
+
+def set_recorder(fn):
+    global _recorder
+    _recorder = fn
+
+
+class _TimedCursor(sqlite3.Cursor):
+    _sample = None
+
+    def _timed(self, method, sql, arg):
+        if _recorder is None:
+            return method(sql, arg)
+        t0 = time.perf_counter()
+        try:
+            return method(sql, arg)
+        finally:
+            self._sample = {"sql": sql, "ms": (time.perf_counter() - t0) * 1000, "rows": max(self.rowcount, 0)}
+            _recorder(self._sample)
+
+    def execute(self, sql, params=()):
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq):
+        return self._timed(super().executemany, sql, seq)
+
+    def _fetch(self, method, *args):
+        sample = self._sample
+        if sample is None or _recorder is None:
+            return method(*args)
+        t0 = time.perf_counter()
+        rows = method(*args)
+        sample["ms"] += (time.perf_counter() - t0) * 1000
+        sample["rows"] += (rows is not None) if not isinstance(rows, list) else len(rows)
+        _recorder(sample)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class _Connection(sqlite3.Connection):
+    # Connection.execute() builds its cursor in C without calling cursor(), hence the overrides.
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+def _connect():
+    # uri=True lets ATTACH take "file:...?mode=ro"; a plain path still opens as before.
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None,
+                          timeout=BUSY_TIMEOUT_MS / 1000, factory=_Connection, uri=True)
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+# Readers check a connection out of the pool for the duration of one call, so every
+# Streamlit session thread gets its own connection and WAL lets them read while a write
+# is in flight. Writes all go through one connection behind a lock: SQLite only allows
+# one writer anyway, and queueing in-process is cheaper than spinning on SQLITE_BUSY.
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_writer = None
+_write_lock = threading.RLock()
+_on_commit = []
+
+
+def configure(path):
+    """Point the module at another database file (seeding, benchmarks, maintenance tools)."""
+    global DB_PATH, _writer
+    with _write_lock:
+        DB_PATH = path
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+        while True:
+            try:
+                _pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _attach(con, attach, readonly):
+    mode = "?mode=ro" if readonly else ""
+    for alias, path in attach.items():
+        con.execute(f"ATTACH DATABASE ? AS {alias}", ("file:" + urllib.parse.quote(os.path.abspath(path)) + mode,))
+
+
+def _detach(con, attach):
+    for alias in attach:
+        try:
+            con.execute(f"DETACH DATABASE {alias}")
+        except sqlite3.OperationalError:
+            pass  # never attached (the ATTACH itself failed)
+
+
+@contextmanager
+def reader(attach=None):
+    """Pooled read connection; attach maps alias -> database file, attached read-only for the call."""
+    try:
+        con = _pool.get_nowait()
+    except queue.Empty:
+        con = _connect()
+    try:
+        if attach:
+            _attach(con, attach, readonly=True)
+        yield con
+    finally:
+        if con.in_transaction:
+            con.rollback()
+        if attach:
+            _detach(con, attach)
+        try:
+            _pool.put_nowait(con)
+        except queue.Full:
+            con.close()
+
+
+@contextmanager
+def write(attach=None):
+    """Serialized write transaction. Yields a cursor; commits on exit, rolls back on error.
+
+    attach maps alias -> database file, attached read-write for this transaction only.
+    """
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            _writer = _connect()
+        if _writer.in_transaction:
+            if attach:
+                raise RuntimeError("cannot ATTACH inside an open write() transaction")
+            # Re-entrant use from inside another write() joins the outer transaction.
+            yield _writer.cursor()
+            return
+        cur = _writer.cursor()
+        if attach:
+            _attach(_writer, attach, readonly=False)
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                _writer.rollback()
+                _on_commit.clear()
+                raise
+            else:
+                _writer.commit()
+                callbacks = _on_commit[:]
+                _on_commit.clear()
+                for fn in callbacks:
+                    fn()
+        finally:
+            if attach:
+                _detach(_writer, attach)
+
+
+def vacuum():
+    """Rebuild the main file so pages freed by archiving go back to the OS."""
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            _writer = _connect()
+        _writer.execute("VACUUM")
+
+
+def after_commit(fn):
+    """Run fn once the enclosing write() transaction commits (dropped on rollback)."""
+    _on_commit.append(fn)
+
+
+# --- READ HELPERS ---
+def query_df(sql, params=()):
+    with reader() as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+
+def fetchone(sql, params=()):
+    with reader() as con:
+        return con.execute(sql, params).fetchone()
+
+
+def fetchall(sql, params=()):
+    with reader() as con:
+        return con.execute(sql, params).fetchall()
+
+
+# --- WRITE HELPERS ---
+def execute(sql, params=()):
+    with write() as cur:
+        cur.execute(sql, params)
+        return cur.lastrowid
+
+
+def executemany(sql, seq):
+    with write() as cur:
+        cur.executemany(sql, seq)
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+import db
+
+# --- QUERY & PAGE INSTRUMENTATION ---
+# Installs itself as the db recorder on import. Every statement lands in a bounded
+# ring buffer tagged with the page of the rerun that issued it. Statements slower than
+# SLOW_QUERY_MS also go to the slow-query log and the "rideboss.sql" logger. app.py
+# brackets each rerun with start_run()/finish_run() for per-page script time. A rerun cut
+# short by st.rerun() (or by a new interaction) is closed out by the next start_run(),
+# which follows at once; pages that end in st.stop() call finish_run() first.
+SLOW_QUERY_MS = float(os.environ.get("RIDEBOSS_SLOW_QUERY_MS", "250"))
+MAX_SAMPLES = int(os.environ.get("RIDEBOSS_DIAG_SAMPLES", "20000"))
+MAX_RUNS = 2000
+
+logger = logging.getLogger("rideboss.sql")
+
+_samples = deque(maxlen=MAX_SAMPLES)
+_slow = deque(maxlen=500)
+_runs = deque(maxlen=MAX_RUNS)
+_local = threading.local()
+
+
+def _normalize(sql):
+    return re.sub(r"\s+", " ", sql).strip()[:300]
+
+
+def record(sample):
+    if "ts" not in sample:
+        run = getattr(_local, "run", None)
+        sample["ts"] = time.time()
+        sample["page"] = run["page"] if run else None
+        sample["sql"] = _normalize(sample["sql"])
+        _samples.append(sample)
+        if run is not None:
+            run["samples"].append(sample)
+    if sample["ms"] >= SLOW_QUERY_MS and not sample.get("slow"):
+        sample["slow"] = True
+        _slow.append(sample)
+        logger.warning("slow query %.1fms (%s rows) on %s: %s", sample["ms"], sample["rows"], sample["page"], sample["sql"])
+
+
+db.set_recorder(record)
+
+
+# --- RERUN BRACKETS ---
+def start_run(page=None):
+    finish_run()
+    _local.run = {"page": page, "t0": time.perf_counter(), "samples": []}
+
+
+def set_page(page):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["page"] = page
+        for sample in run["samples"]:
+            sample["page"] = page
+
+
+def finish_run():
+    run = getattr(_local, "run", None)
+    _local.run = None
+    if run is None:
+        return None
+    summary = {"ts": time.time(), "page": run["page"], "ms": (time.perf_counter() - run["t0"]) * 1000,
+               "queries": len(run["samples"]), "query_ms": sum(s["ms"] for s in run["samples"]),
+               "rows": sum(s["rows"] for s in run["samples"])}
+    _runs.append(summary)
+    return summary
+
+
+# --- REPORTS ---
+def sample_count():
+    return len(_samples)
+
+
+def _p(q):
+    def quantile(series):
+        return series.quantile(q)
+    quantile.__name__ = f"p{int(q * 100)}_ms"
+    return quantile
+
+
+def query_stats(limit=25):
+    """Per-statement call count, p50/p95 latency and rows, heaviest total time first."""
+    df = pd.DataFrame(list(_samples), columns=["sql", "ms", "rows", "page", "ts"])
+    if df.empty:
+        return df
+    stats = df.groupby("sql").agg(calls=("ms", "size"), total_ms=("ms", "sum"), p50_ms=("ms", _p(0.5)),
+                                  p95_ms=("ms", _p(0.95)), avg_rows=("rows", "mean"))
+    return stats.sort_values("total_ms", ascending=False).head(limit).round(2).reset_index()
+
+
+def page_stats():
+    """Per-page rerun count and p50/p95 script time, with queries per rerun."""
+    df = pd.DataFrame(list(_runs), columns=["ts", "page", "ms", "queries", "query_ms", "rows"])
+    if df.empty:
+        return df
+    return df.groupby("page").agg(reruns=("ms", "size"), p50_ms=("ms", _p(0.5)), p95_ms=("ms", _p(0.95)),
+                                  queries_per_run=("queries", "mean"), query_ms_per_run=("query_ms", "mean"),
+                                  rows_per_run=("rows", "mean")).round(2).reset_index()
+
+
+def recent_runs(limit=50):
+    df = pd.DataFrame(list(_runs)[-limit:], columns=["ts", "page", "ms", "queries", "query_ms", "rows"])
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    df[["ms", "query_ms"]] = df[["ms", "query_ms"]].round(2)
+    return df.iloc[::-1]
+
+
+def slow_queries():
+    df = pd.DataFrame(list(_slow), columns=["ts", "page", "ms", "rows", "sql"])
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    df["ms"] = df["ms"].round(2)
+    return df.iloc[::-1]
+
+
+def db_sizes():
+    """Bytes on disk for the database file and its WAL/shared-memory companions."""
+    return {suffix or "db": os.path.getsize(db.DB_PATH + suffix) if os.path.exists(db.DB_PATH + suffix) else 0
+            for suffix in ("", "-wal", "-shm")}
+
+
+def export_samples():
+    """JSON dump of the raw samples and rerun timings for offline profiling."""
+    keep = ("ts", "page", "ms", "rows", "sql")
+    return json.dumps({"exported": datetime.now().isoformat(timespec="seconds"),
+                       "slow_query_ms": SLOW_QUERY_MS,
+                       "samples": [{k: s.get(k) for k in keep} for s in list(_samples)],
+                       "runs": list(_runs)})
@@ -0,0 +1,153 @@
+import argparse
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+import db
+
+# --- EVENT LOG ---
+# Events either ride along in the caller's write transaction (pass the cursor) or are
+# buffered here and flushed in one batch once FLUSH_SIZE events pile up or
+# FLUSH_SECONDS pass, so logging never costs a commit of its own. Rows older than
+# RETENTION_DAYS are compacted into per-day counts in notifications_daily, at most once
+# a day, by the app's flushes and history reads; the exit hook only writes the buffer.
+FLUSH_SIZE = 50
+FLUSH_SECONDS = 2.0
+RETENTION_DAYS = int(os.environ.get("RIDEBOSS_EVENT_RETENTION_DAYS", "90"))
+PAGE_SIZE = 50
+KINDS = ["SALE", "CARD", "HANDOVER", "RELEASE", "STAFF", "SYSTEM"]
+
+DDL = (
+    "ALTER TABLE notifications ADD COLUMN ts TEXT",
+    "ALTER TABLE notifications ADD COLUMN kind TEXT NOT NULL DEFAULT 'SYSTEM'",
+    # Legacy rows only kept the time of day; date them to the migration day.
+    "UPDATE notifications SET ts = date('now', 'localtime') || ' ' || timestamp WHERE ts IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_ts ON notifications(ts)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_kind ON notifications(kind, id)",
+    '''CREATE TABLE IF NOT EXISTS notifications_daily
+       (day TEXT, kind TEXT, n INTEGER, PRIMARY KEY (day, kind)) WITHOUT ROWID''',
+)
+
+INSERT_SQL = "INSERT INTO notifications (message, timestamp, ts, kind) VALUES (?,?,?,?)"
+
+_lock = threading.Lock()
+_buffer = []
+_timer = None
+_latest = None
+_compacted_on = None
+
+
+def _row(msg, kind):
+    now = datetime.now()
+    hms = now.strftime("%H:%M:%S")
+    return (f"{hms} | {msg}", hms, now.strftime(db.TS_FMT), kind)
+
+
+def _set_latest(message):
+    global _latest
+    _latest = message
+
+
+def log(msg, kind="SYSTEM", c=None):
+    """Record an event; with a cursor it is written in that transaction."""
+    global _timer
+    row = _row(msg, kind)
+    if c is not None:
+        c.execute(INSERT_SQL, row)
+        db.after_commit(lambda: _set_latest(row[0]))
+        return
+    with _lock:
+        _buffer.append(row)
+        _set_latest(row[0])
+        if len(_buffer) < FLUSH_SIZE:
+            if _timer is None:
+                _timer = threading.Timer(FLUSH_SECONDS, flush)
+                _timer.daemon = True
+                _timer.start()
+            return
+    flush()
+
+
+def flush(compact_due=True):
+    """Write buffered events; a no-op when nothing is buffered."""
+    global _timer
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not rows:
+        return
+    with db.write() as c:
+        c.executemany(INSERT_SQL, rows)
+    if compact_due:
+        compact_if_due()
+
+
+atexit.register(flush, compact_due=False)
+
+
+def latest():
+    """Most recent event message, served from memory after the first call."""
+    if _latest is None:
+        row = db.fetchone("SELECT message FROM notifications ORDER BY id DESC LIMIT 1")
+        _set_latest(row[0] if row else "READY")
+    return _latest
+
+
+# --- RETENTION ---
+def compact_if_due():
+    if _compacted_on != datetime.now().date():
+        compact()
+
+
+def compact(retain_days=None):
+    """Fold events older than retain_days into notifications_daily and delete them."""
+    global _compacted_on
+    retain_days = RETENTION_DAYS if retain_days is None else retain_days
+    cutoff = (datetime.now() - timedelta(days=retain_days)).strftime("%Y-%m-%d 00:00:00")
+    with db.write() as c:
+        c.execute('''INSERT INTO notifications_daily (day, kind, n)
+                     SELECT substr(ts, 1, 10), kind, COUNT(*) FROM notifications WHERE ts < ? GROUP BY 1, 2
+                     ON CONFLICT (day, kind) DO UPDATE SET n = n + excluded.n''', (cutoff,))
+        c.execute("DELETE FROM notifications WHERE ts < ?", (cutoff,))
+        removed = c.rowcount
+    _compacted_on = datetime.now().date()
+    return removed
+
+
+# --- HISTORY ---
+def page(before_id=None, kinds=None, start=None, end=None, limit=PAGE_SIZE, flush_buffer=True):
+    """One page of history, newest first. Pass the last id seen as before_id for the next page.
+
+    flush_buffer=False reads without writing first: no buffer flush, no compaction (read-only callers)."""
+    if flush_buffer:
+        flush()
+        compact_if_due()
+    where, params = [], []
+    if before_id is not None:
+        where.append("id < ?"); params.append(before_id)
+    if kinds:
+        where.append(f"kind IN ({','.join('?' * len(kinds))})"); params.extend(kinds)
+    if start:
+        where.append("ts >= ?"); params.append(start)
+    if end:
+        where.append("ts <= ?"); params.append(end)
+    sql = "SELECT id, ts AS 'TIME', kind AS 'TYPE', message AS 'EVENT' FROM notifications"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    return db.query_df(sql, params + [limit])
+
+
+if __name__ == "__main__":
+    import schema
+
+    parser = argparse.ArgumentParser(description="Event log maintenance.")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="days of raw events to keep")
+    args = parser.parse_args()
+    schema.bootstrap()
+    print(f"compacted {compact(args.days)} events older than {args.days} days")
@@ -0,0 +1,96 @@
+import argparse
+import os
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+import archive
+import db
+import reports
+
+# --- STREAMING EXPORT ---
+# Rows are pulled from SQLite CHUNK_ROWS at a time and appended to the output file, so
+# memory stays flat however wide the reporting range is. Ranges reaching into archived
+# years stream from the yearly archive files too.
+CHUNK_ROWS = 5000
+FORMATS = {"csv": "text/csv", "parquet": "application/octet-stream"}
+
+QUERIES = {
+    "sales": "SELECT * FROM {sales} WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp",
+    "expenses": "SELECT * FROM {expenses} WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp",
+    "memberships": "SELECT * FROM memberships ORDER BY plate",
+    "receipts": "SELECT * FROM {receipts} WHERE ts BETWEEN ? AND ? ORDER BY ts",
+    "card_ledger": "SELECT * FROM card_ledger WHERE ts BETWEEN ? AND ? ORDER BY ts",
+}
+
+
+def iter_chunks(kind, start, end, chunksize=CHUNK_ROWS):
+    sql = QUERIES[kind]
+    params = (start, end) if "?" in sql else ()
+    with archive.reader(start, end) as (con, sources):
+        yield from pd.read_sql_query(sql.format(**sources), con, params=params, chunksize=chunksize)
+
+
+def write_csv(kind, start, end, path):
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        for i, chunk in enumerate(iter_chunks(kind, start, end)):
+            chunk.to_csv(fh, header=i == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def _arrow_type(pa, declared):
+    # SQLite affinity rules: INT -> integer, REAL/FLOA/DOUB -> real, everything else is kept as text.
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return pa.int64()
+    if any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def arrow_schema(pa, kind):
+    """Parquet schema from the table's declared column types, so a chunk of all-NULL columns cannot narrow it."""
+    cols = db.fetchall(f"PRAGMA table_info({kind})")
+    return pa.schema([(name, _arrow_type(pa, declared)) for _, name, declared, *_ in cols])
+
+
+def write_parquet(kind, start, end, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    schema, rows = arrow_schema(pa, kind), 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(kind, start, end):
+            writer.write_table(pa.Table.from_pandas(chunk, preserve_index=False).cast(schema))
+            rows += len(chunk)
+    return rows
+
+
+def export_file(kind, fmt, start, end):
+    """Write the export to a temp file and return (path, row count); the caller removes the file."""
+    fd, path = tempfile.mkstemp(prefix=f"rideboss_{kind}_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        rows = (write_parquet if fmt == "parquet" else write_csv)(kind, start, end, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a report range to CSV or Parquet.")
+    parser.add_argument("kind", choices=list(QUERIES))
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2000, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    start_ts, end_ts = reports.custom_range(args.start, args.end)
+    writer = write_parquet if args.format == "parquet" else write_csv
+    print(f"wrote {writer(args.kind, start_ts, end_ts, args.output)} rows to {args.output}")
@@ -0,0 +1,236 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import customers
+import db
+import events
+import receipts
+import rollups
+
+# --- BULK IMPORT ---
+# Loads customers, sales, expenses or membership cards from CSV/XLSX in one write
+# transaction per file. Rows are validated and normalized column-wise in pandas, bad
+# rows are set aside with a reason, and the good ones go in with executemany. Customer
+# visit counts, the daily rollups and receipts are then updated set-based from the id range just
+# inserted, instead of one upsert per row as at the till. Dry runs do all of the above
+# and roll back.
+DEFAULT_COUNTRY = "234"
+PLATE_RE = r"^[A-Z0-9][A-Z0-9-]{2,11}$"
+SALE_TYPES = ("CAR WASH", "LOUNGE")
+# Named whole-column date layouts for --date-format; any other value is a strptime pattern.
+# A column is read in one layout only: cells that do not fit it are rejected, never guessed.
+DATE_FORMATS = {
+    "iso": ["ISO8601"],
+    "dayfirst": ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y"],
+    "monthfirst": ["%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%m/%d/%Y"],
+}
+
+# kind -> (required columns, optional columns with defaults)
+SPECS = {
+    "customers": (["plate"], {"name": "", "phone": ""}),
+    "sales": (["timestamp", "total"], {"plate": "", "name": "", "phone": "", "services": "", "method": "Cash",
+                                       "staff": "", "type": "CAR WASH"}),
+    "expenses": (["description", "amount", "timestamp"], {}),
+    "memberships": (["plate", "balance_washes", "card_type"], {"sale_price": 0.0, "timestamp": "now"}),
+}
+ALIASES = {"date": "timestamp", "time": "timestamp", "datetime": "timestamp", "price": "total", "amount_paid": "total",
+           "plate_number": "plate", "mobile": "phone", "phone_number": "phone", "customer": "name", "washes": "balance_washes",
+           "balance": "balance_washes", "tier": "card_type", "card": "card_type", "service": "services"}
+
+
+class LoadError(Exception):
+    pass
+
+
+def read_file(path):
+    """Every cell as a string; the normalizers below do the typing."""
+    if path.lower().endswith((".xlsx", ".xls")):
+        try:
+            return pd.read_excel(path, dtype=str, keep_default_na=False)
+        except ImportError:
+            raise RuntimeError("XLSX import needs openpyxl (pip install openpyxl).")
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+# --- NORMALIZERS (vectorized; each returns the cleaned column and a mask of bad values) ---
+def norm_plate(col, required=True):
+    out = col.map(customers.normalize_plate)
+    bad = ~out.str.match(PLATE_RE)
+    return out, bad & ((out != "") | required)
+
+
+def norm_phone(col):
+    digits = col.str.replace(r"\D", "", regex=True)
+    local = digits.str.startswith("0")
+    out = digits.where(~local, DEFAULT_COUNTRY + digits.str[1:])
+    return out, (out != "") & ~out.str.len().between(10, 15)
+
+
+def norm_timestamp(col, date_format="iso"):
+    parsed = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS.get(date_format, [date_format]):
+        parsed = parsed.fillna(pd.to_datetime(col, errors="coerce", format=fmt))
+    parsed[col.str.lower() == "now"] = pd.Timestamp.now().floor("s")
+    return parsed.dt.strftime(db.TS_FMT), parsed.isna()
+
+
+def norm_number(col, integer=False):
+    num = pd.to_numeric(col.str.replace(",", "").str.replace("₦", "").str.strip(), errors="coerce")
+    bad = num.isna() | (num < 0)
+    if integer:
+        bad |= num.notna() & (num % 1 != 0)
+    return num.fillna(0).astype(int if integer else float), bad
+
+
+def prepare(kind, raw, date_format="iso"):
+    """Normalize raw string columns; returns (clean rows, rejected rows with a reason)."""
+    required, optional = SPECS[kind]
+    df = raw.rename(columns=lambda c: str(c).strip().lower().replace(" ", "_")).rename(columns=ALIASES)
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise LoadError(f"{kind} file is missing column(s): {', '.join(missing)}")
+    if kind == "memberships" and "sale_price" in df.columns and "timestamp" not in df.columns:
+        # Undated cards load as opening balances; money without a sale date would land on today.
+        raise LoadError("memberships file has sale_price but no timestamp column")
+    for col, default in optional.items():
+        if col not in df.columns:
+            df[col] = str(default)
+    df = df[required + list(optional)].apply(lambda s: s.astype(str).str.strip())
+    reason = pd.Series("", index=df.index)
+
+    def check(col, result, why):
+        df[col], bad = result
+        reason.mask(bad & (reason == ""), why, inplace=True)
+
+    if "plate" in df:
+        check("plate", norm_plate(df["plate"], required="plate" in required), "bad plate")
+    if "phone" in df:
+        check("phone", norm_phone(df["phone"]), "bad phone")
+    if "timestamp" in df:
+        check("timestamp", norm_timestamp(df["timestamp"], date_format), f"bad date (expected {date_format})")
+    for col in ("total", "amount", "sale_price"):
+        if col in df:
+            check(col, norm_number(df[col]), f"bad {col}")
+    if "balance_washes" in df:
+        check("balance_washes", norm_number(df["balance_washes"], integer=True), "bad balance_washes")
+    if kind == "sales":
+        df["type"] = df["type"].str.upper()
+        check("type", (df["type"], ~df["type"].isin(SALE_TYPES)), "bad type")
+    if kind == "expenses":
+        check("description", (df["description"], df["description"] == ""), "missing description")
+    if kind == "memberships":
+        check("card_type", (df["card_type"], df["card_type"] == ""), "missing card_type")
+
+    # Later rows win when a file repeats a plate.
+    keyed = kind in ("customers", "memberships")
+    dup = df["plate"].duplicated(keep="last") & (reason == "") if keyed else pd.Series(False, index=df.index)
+    reason.mask(dup, "duplicate plate (later row kept)", inplace=True)
+    rejected = raw.loc[reason != ""].assign(row=reason.index[reason != ""] + 2, reason=reason[reason != ""])
+    return df.loc[reason == ""], rejected
+
+
+# --- LOADERS (call inside db.write()) ---
+def _customers(c, df):
+    c.executemany('''INSERT INTO customers (plate, name, phone, visits, last_visit) VALUES (?, ?, ?, 0, NULL)
+                     ON CONFLICT (plate) DO UPDATE SET name = COALESCE(NULLIF(excluded.name, ''), name),
+                     phone = COALESCE(NULLIF(excluded.phone, ''), phone)''',
+                  df[["plate", "name", "phone"]].itertuples(index=False, name=None))
+
+
+def _sales(c, df):
+    after_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+    c.executemany("INSERT INTO sales (plate, services, total, method, staff, timestamp, type) VALUES (?,?,?,?,?,?,?)",
+                  df[["plate", "services", "total", "method", "staff", "timestamp", "type"]].itertuples(index=False, name=None))
+    named = df[(df["plate"] != "") & ((df["name"] != "") | (df["phone"] != ""))].drop_duplicates("plate", keep="last")
+    _customers(c, named)
+    # New ids are always above the old MAX(id), so this range is exactly the rows just loaded.
+    c.execute('''INSERT INTO customers (plate, visits, last_visit)
+                 SELECT plate, COUNT(*), substr(MAX(timestamp), 1, 10) FROM sales WHERE id > ? AND plate != '' GROUP BY plate
+                 ON CONFLICT (plate) DO UPDATE SET visits = COALESCE(visits, 0) + excluded.visits,
+                 last_visit = MAX(COALESCE(last_visit, ''), excluded.last_visit)''', (after_id,))
+    rollups.record_sales_since(c, after_id)
+    receipts.backfill(c, after_id)
+
+
+def _expenses(c, df):
+    after_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM expenses").fetchone()[0]
+    c.executemany("INSERT INTO expenses (description, amount, timestamp) VALUES (?,?,?)",
+                  df[["description", "amount", "timestamp"]].itertuples(index=False, name=None))
+    rollups.record_expenses_since(c, after_id)
+
+
+def _memberships(c, df):
+    rows = list(df[["plate", "balance_washes", "card_type", "sale_price", "timestamp"]].itertuples(index=False, name=None))
+    # The file states each card's balance; the ledger records the change from what was held.
+    c.executemany('''INSERT INTO card_ledger (plate, event, washes, amount, card_type, ts)
+                     VALUES (?1, 'IMPORT', ?2 - COALESCE((SELECT balance_washes FROM memberships WHERE plate = ?1), 0), ?4, ?3, ?5)''',
+                  rows)
+    c.executemany('''INSERT INTO memberships (plate, balance_washes, card_type, sale_price, issued) VALUES (?,?,?,?,?)
+                     ON CONFLICT (plate) DO UPDATE SET balance_washes = excluded.balance_washes, card_type = excluded.card_type,
+                     sale_price = excluded.sale_price, issued = excluded.issued''', rows)
+
+
+LOADERS = {"customers": _customers, "sales": _sales, "expenses": _expenses, "memberships": _memberships}
+
+
+class _DryRun(Exception):
+    pass
+
+
+def import_frame(kind, raw, dry_run=False, source="upload", date_format="iso"):
+    """Validate and load one frame; returns a report dict with counts, timings and the rejected rows."""
+    t0 = time.perf_counter()
+    clean, rejected = prepare(kind, raw, date_format)
+    t1 = time.perf_counter()
+    try:
+        with db.write() as c:
+            LOADERS[kind](c, clean)
+            events.log(f"IMPORT: {len(clean):,} {kind} from {source}", "SYSTEM", c)
+            if dry_run:
+                raise _DryRun
+    except _DryRun:
+        pass
+    t2 = time.perf_counter()
+    return {"kind": kind, "rows": len(raw), "loaded": 0 if dry_run else len(clean), "valid": len(clean),
+            "rejected": len(rejected), "dry_run": dry_run, "validate_s": round(t1 - t0, 3), "load_s": round(t2 - t1, 3),
+            "rows_per_s": round(len(raw) / max(t2 - t0, 1e-9)), "rejects": rejected}
+
+
+def import_file(kind, path, dry_run=False, date_format="iso"):
+    return import_frame(kind, read_file(path), dry_run, source=os.path.basename(path), date_format=date_format)
+
+
+if __name__ == "__main__":
+    import schema
+
+    parser = argparse.ArgumentParser(description="Bulk-load customers, sales, expenses or membership cards from CSV/XLSX.")
+    parser.add_argument("kind", choices=list(SPECS))
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--dry-run", action="store_true", help="validate and load, then roll back")
+    parser.add_argument("--rejects", help="write rejected rows (with reasons) to this CSV")
+    parser.add_argument("--date-format", default="iso",
+                        help=f"layout of every date in the file: {', '.join(DATE_FORMATS)} or a strptime pattern (default iso)")
+    args = parser.parse_args()
+    schema.bootstrap()
+    all_rejects, failed = [], False
+    for path in args.files:
+        try:
+            rep = import_file(args.kind, path, args.dry_run, args.date_format)
+        except LoadError as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+        verb = "checked" if rep["dry_run"] else "loaded"
+        print(f"{path}: {verb} {rep['valid']:,} of {rep['rows']:,} rows, {rep['rejected']:,} rejected "
+              f"(validate {rep['validate_s']}s, load {rep['load_s']}s, {rep['rows_per_s']:,} rows/s)")
+        for _, r in rep["rejects"].head(5).iterrows():
+            print(f"  row {r['row']}: {r['reason']}")
+        all_rejects.append(rep["rejects"].assign(file=path))
+    if args.rejects and all_rejects:
+        pd.concat(all_rejects).to_csv(args.rejects, index=False)
+        print(f"rejected rows written to {args.rejects}")
+    sys.exit(1 if failed else 0)
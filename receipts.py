@@ -0,0 +1,146 @@
+import hashlib
+import hmac
+import html
+import os
+import secrets
+from functools import lru_cache
+from string import Template
+
+import archive
+import db
+
+# --- RECEIPTS ---
+# Every sale writes its receipt row in the checkout transaction, keyed by the sale id.
+# The print route (?receipt=<id>) and day reprints (?receipts_day=YYYY-MM-DD) look rows
+# up by id or by the ts index and fill precompiled string.Templates. A receipt never
+# changes once written, so rendered HTML is cached per id; a day document is cached on
+# (day, receipt count, last id) so a closed day renders once. Print tabs open as new,
+# logged-out sessions, so print URLs carry an HMAC of what they print (&sig=...) and the
+# route refuses anything unsigned. Set RIDEBOSS_RECEIPT_KEY to keep links valid across
+# restarts; otherwise each process signs with its own random key.
+SIGNING_KEY = os.environ.get("RIDEBOSS_RECEIPT_KEY", "").encode() or secrets.token_bytes(32)
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS receipts
+       (id INTEGER PRIMARY KEY, ts TEXT, mode TEXT, plate TEXT, name TEXT, phone TEXT,
+        items TEXT, total REAL, method TEXT, staff TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_receipts_ts ON receipts(ts)",
+)
+
+COLUMNS = ["id", "ts", "mode", "plate", "name", "phone", "items", "total", "method", "staff"]
+
+RECEIPT = Template('''<div class="receipt-wrap">
+    <div class="receipt-header"><h1>RIDEBOSS AUTOS</h1><p>Premium Detailing & Lounge</p><p>Phone: 09029557912</p></div>
+    <div class="receipt-body">
+        <div class="receipt-row"><span>Receipt ID:</span> <span>#RB$id</span></div>
+        <div class="receipt-row"><span>Date:</span> <span>$ts</span></div>
+        <div class="receipt-row"><span>Plate:</span> <span>$plate</span></div>
+        <div class="receipt-row"><span>Paid via:</span> <span>$method</span></div>
+        <hr style="border:1px solid black">
+        <p><b>DESCRIPTION:</b></p><p>$items</p>
+        <div class="receipt-total"><span>TOTAL:</span><span>&#8358;$total</span></div>
+    </div>
+    <div style="text-align:center;"><div class="receipt-stamp">RIDEBOSS OFFICIAL STAMP</div></div>
+</div>''')
+
+PAGE = Template('''<style>
+    .stApp { background-color: white !important; color: black !important; }
+    [data-testid="stSidebar"], .stButton, header { display: none !important; }
+    .receipt-wrap { background: white; color: black; padding: 20px; font-family: 'Courier New', monospace; max-width: 400px;
+                    margin: auto; border: 1px solid #000; page-break-after: always; break-after: page; }
+    .receipt-header { text-align: center; border-bottom: 2px dashed black; padding-bottom: 10px; }
+    .receipt-header h1 { font-size: 22px; margin: 0; }
+    .receipt-row { display: flex; justify-content: space-between; margin: 6px 0; }
+    .receipt-total { border-top: 2px solid black; margin-top: 10px; display: flex; justify-content: space-between;
+                     font-weight: bold; font-size: 20px; }
+    .receipt-stamp { border: 2px solid #900; color: #900; padding: 5px 15px; display: inline-block; margin-top: 15px; }
+</style>
+$body
+<script>window.print();</script>''')
+
+
+# --- WRITES (call inside db.write()) ---
+def record(c, sale_id, ts, mode, plate, name, phone, items, total, method, staff):
+    c.execute(f"INSERT INTO receipts ({', '.join(COLUMNS)}) VALUES ({','.join('?' * len(COLUMNS))})",
+              (sale_id, ts, mode, plate, name, phone, items, total, method, staff))
+
+
+def backfill(c, after_id=0):
+    """Receipts for sales that never went through checkout (older rows, imports, seeding)."""
+    c.execute('''INSERT OR IGNORE INTO receipts (id, ts, mode, plate, name, phone, items, total, method, staff)
+                 SELECT s.id, s.timestamp, s.type, s.plate, cu.name, cu.phone, s.services, s.total, s.method, s.staff
+                 FROM sales s LEFT JOIN customers cu ON cu.plate = s.plate WHERE s.id > ?''', (after_id,))
+
+
+# --- SIGNED PRINT LINKS ---
+def sign(kind, value):
+    return hmac.new(SIGNING_KEY, f"{kind}:{value}".encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def verify(kind, value, sig):
+    return hmac.compare_digest(sign(kind, value), str(sig or ""))
+
+
+def url(sale_id):
+    return f"?receipt={int(sale_id)}&sig={sign('receipt', int(sale_id))}"
+
+
+def day_url(day):
+    return f"?receipts_day={day}&sig={sign('day', day)}"
+
+
+# --- RENDERING ---
+def _fill(row):
+    r = dict(zip(COLUMNS, row))
+    r["total"] = f"{r['total'] or 0:,.2f}"
+    return RECEIPT.substitute({k: html.escape(str(v if v is not None else "")) for k, v in r.items()})
+
+
+def get(sale_id):
+    sql = f"SELECT {', '.join(COLUMNS)} FROM {{receipts}} WHERE id=?"
+    row = db.fetchone(sql.format(receipts="receipts"), (sale_id,))
+    if row is None and archive.archived_years():
+        row = next(iter(archive.fetchall(sql, params=(sale_id,))), None)
+    return row
+
+
+@lru_cache(maxsize=2048)
+def _render(sale_id):
+    row = get(sale_id)
+    if row is None:
+        raise KeyError(sale_id)  # misses are not cached; the sale may not exist yet
+    return _fill(row)
+
+
+def render(sale_id):
+    """Receipt HTML for one sale, or None when there is no such receipt."""
+    try:
+        return _render(sale_id)
+    except KeyError:
+        return None
+
+
+def print_page(body):
+    return PAGE.substitute(body=body)
+
+
+def _day_bounds(day):
+    return f"{day} 00:00:00", f"{day} 23:59:59"
+
+
+def day_rows(day):
+    start, end = _day_bounds(day)
+    return archive.fetchall(f"SELECT {', '.join(COLUMNS)} FROM {{receipts}} WHERE ts BETWEEN ? AND ? ORDER BY id",
+                            start, end, (start, end))
+
+
+@lru_cache(maxsize=64)
+def _day_document(day, n, last_id):
+    return "\n".join(_fill(row) for row in day_rows(day))
+
+
+def day_document(day):
+    """Every receipt for the day (YYYY-MM-DD) as one HTML body, ready for print_page()."""
+    start, end = _day_bounds(day)
+    n, last_id = archive.fetchall("SELECT COUNT(*), MAX(id) FROM {receipts} WHERE ts BETWEEN ? AND ?",
+                                  start, end, (start, end))[0]
+    return _day_document(str(day), n, last_id) if n else ""
@@ -0,0 +1,78 @@
+import calendar
+from datetime import date, datetime, time, timedelta
+
+import archive
+import db
+import rollups
+
+# --- REPORTING RANGES ---
+# Every range is an inclusive (start, end) pair of TS_FMT strings. Sales and expenses
+# store the same fixed-width format, so `timestamp BETWEEN ? AND ?` sorts correctly
+# and runs on the timestamp indexes. Ranges reaching into archived years read the
+# yearly archive files as well (archive.query_df).
+TS_FMT = db.TS_FMT
+
+# Shift name -> (start hour, end hour); an end at or before the start runs past midnight.
+SHIFTS = {"MORNING": (6, 14), "AFTERNOON": (14, 22), "NIGHT": (22, 6)}
+
+
+def _ts(dt):
+    return dt.strftime(TS_FMT)
+
+
+def day_range(d):
+    return custom_range(d, d)
+
+
+def month_range(year, month):
+    return custom_range(date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+
+
+def year_range(year):
+    return custom_range(date(year, 1, 1), date(year, 12, 31))
+
+
+def custom_range(start_date, end_date):
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+    return _ts(datetime.combine(start_date, time.min)), _ts(datetime.combine(end_date, time(23, 59, 59)))
+
+
+def shift_range(d, shift):
+    start_h, end_h = SHIFTS[shift]
+    start = datetime.combine(d, time(start_h))
+    end = datetime.combine(d + timedelta(days=1) if end_h <= start_h else d, time(end_h)) - timedelta(seconds=1)
+    return _ts(start), _ts(end)
+
+
+def whole_days(start, end):
+    return start.endswith("00:00:00") and end.endswith("23:59:59")
+
+
+# --- QUERIES ---
+def sales_between(start, end):
+    return archive.query_df("SELECT * FROM {sales} WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", start, end, (start, end))
+
+
+def expenses_between(start, end):
+    return archive.query_df("SELECT * FROM {expenses} WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", start, end, (start, end))
+
+
+def totals(start, end):
+    """Revenue per sale type plus expenses; whole-day ranges come from the rollups."""
+    if whole_days(start, end):
+        return rollups.totals(start[:10], end[:10])
+    out = {"CAR WASH": 0.0, "LOUNGE": 0.0, "EXPENSES": 0.0}
+    for sale_type, total in archive.fetchall(
+            "SELECT type, SUM(total) FROM {sales} WHERE timestamp BETWEEN ? AND ? GROUP BY type", start, end, (start, end)):
+        out[sale_type] = total or 0.0
+    out["EXPENSES"] = archive.fetchall(
+        "SELECT COALESCE(SUM(amount), 0) FROM {expenses} WHERE timestamp BETWEEN ? AND ?", start, end, (start, end))[0][0]
+    return out
+
+
+def years_available():
+    first = db.fetchone("SELECT MIN(day) FROM sales_daily")[0]
+    this_year = datetime.now().year
+    first_year = int(first[:4]) if first else this_year
+    return list(range(min(first_year, this_year), this_year + 1))
@@ -0,0 +1,78 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import archive
+import db
+
+# --- RFM RETENTION ENGINE ---
+# Recency, frequency and spend for every plate come from one GROUP BY over sales
+# (covered by idx_sales_plate) across the hot table and every archived year,
+# segmentation is vectorized, and the frame is cached until a new sale, a card change,
+# an archive/restore or a new day invalidates it.
+DDL = ("CREATE INDEX IF NOT EXISTS idx_sales_plate ON sales(plate, timestamp, total)",)
+
+RFM_SQL = '''SELECT c.plate, c.name, c.phone, c.last_visit,
+                    COALESCE(s.frequency, c.visits, 0) AS frequency, COALESCE(s.spend, 0) AS spend,
+                    COALESCE(m.balance_washes, 0) AS card_balance
+             FROM customers c
+             LEFT JOIN (SELECT plate, COUNT(*) AS frequency, SUM(total) AS spend FROM {sales}
+                        WHERE plate != '' GROUP BY plate) s ON s.plate = c.plate
+             LEFT JOIN memberships m ON m.plate = c.plate'''
+
+SEGMENTS = ["AT-RISK CARD HOLDER", "LAPSED", "LAPSING", "LOYAL", "NEW", "ACTIVE"]
+LAPSING_DAYS = 14
+LAPSED_DAYS = 60
+LOYAL_VISITS = 5
+
+MESSAGES = {
+    "AT-RISK CARD HOLDER": "Hi {name}, you still have washes on your RideBoss card for {plate}. We'd love to see you again!",
+    "LAPSED": "Hi {name}, we miss you at RideBoss Autos! Bring {plate} in this week for a fresh shine.",
+    "LAPSING": "Hi {name}, it's been a while since {plate} had a wash. Drop by RideBoss Autos anytime!",
+    "LOYAL": "Hi {name}, thank you for being a loyal RideBoss client. {plate} is always welcome!",
+    "NEW": "Hi {name}, thanks for choosing RideBoss Autos. We look forward to seeing {plate} again!",
+    "ACTIVE": "Hi {name}, thanks for keeping {plate} sparkling with RideBoss Autos!",
+}
+
+_lock = threading.Lock()
+_cached = (None, None)
+
+
+def _version():
+    # Archiving moves old rows without changing MAX(id); the registry marker catches it.
+    return db.fetchone('''SELECT (SELECT MAX(id) FROM sales), (SELECT COUNT(*) FROM customers),
+                                 (SELECT MAX(id) FROM card_ledger),
+                                 (SELECT COUNT(*) || ':' || COALESCE(MAX(archived_at), '') FROM archives)''') \
+        + (datetime.now().date().isoformat(),)
+
+
+def segment(df, today=None):
+    today = pd.Timestamp(today or datetime.now().date())
+    last = pd.to_datetime(df["last_visit"].str[:10], errors="coerce")
+    df["recency_days"] = (today - last).dt.days.fillna(9999).astype(int)
+    df["segment"] = np.select(
+        [(df["card_balance"] > 0) & (df["recency_days"] > LAPSING_DAYS * 2),
+         df["recency_days"] > LAPSED_DAYS,
+         df["recency_days"] > LAPSING_DAYS,
+         df["frequency"] >= LOYAL_VISITS,
+         df["frequency"] <= 1],
+        SEGMENTS[:5], default="ACTIVE")
+    return df
+
+
+def rfm():
+    """Cached RFM frame: plate, name, phone, last_visit, frequency, spend, card_balance, recency_days, segment."""
+    global _cached
+    version = _version()
+    if _cached[0] == version:
+        return _cached[1]
+    with _lock:
+        if _cached[0] != version:
+            _cached = (version, segment(archive.query_df(RFM_SQL)))
+        return _cached[1]
+
+
+def whatsapp_messages(df):
+    return [MESSAGES[seg].format(name=name, plate=plate) for seg, name, plate in zip(df["segment"], df["name"], df["plate"])]
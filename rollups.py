@@ -0,0 +1,98 @@
+import argparse
+
+import db
+
+# --- DAILY ROLLUPS ---
+# sales_daily / expenses_daily hold one row per day (and per type, method and staff
+# for sales). They are bumped inside the same write transaction as the insert they
+# summarise, so FINANCIALS and Staff Performance read O(days) rows instead of every
+# transaction. `rebuild` recomputes them from the base tables, skipping years moved to
+# the archive (archive.py), whose rollups are the only hot copy of that history.
+DDL = (
+    '''CREATE TABLE IF NOT EXISTS sales_daily
+       (day TEXT, type TEXT, method TEXT, staff TEXT, n INTEGER, total REAL,
+        PRIMARY KEY (day, type, method, staff)) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS expenses_daily (day TEXT PRIMARY KEY, n INTEGER, amount REAL) WITHOUT ROWID''',
+    "CREATE INDEX IF NOT EXISTS idx_sales_daily_staff ON sales_daily(type, staff)",
+)
+
+
+def record_sale(c, timestamp, sale_type, method, staff, total, n=1):
+    c.execute('''INSERT INTO sales_daily (day, type, method, staff, n, total) VALUES (?,?,?,?,?,?)
+                 ON CONFLICT (day, type, method, staff) DO UPDATE SET n = n + excluded.n, total = total + excluded.total''',
+              (timestamp[:10], sale_type or "", method or "", staff or "", n, total))
+
+
+def record_expense(c, timestamp, amount, n=1):
+    c.execute('''INSERT INTO expenses_daily (day, n, amount) VALUES (?,?,?)
+                 ON CONFLICT (day) DO UPDATE SET n = n + excluded.n, amount = amount + excluded.amount''',
+              (timestamp[:10], n, amount))
+
+
+def record_sales_since(c, after_id):
+    """Fold every sale with id > after_id into the rollups in one pass (bulk loads)."""
+    c.execute('''INSERT INTO sales_daily (day, type, method, staff, n, total)
+                 SELECT substr(timestamp, 1, 10), COALESCE(type, ''), COALESCE(method, ''), COALESCE(staff, ''), COUNT(*), COALESCE(SUM(total), 0)
+                 FROM sales WHERE id > ? GROUP BY 1, 2, 3, 4
+                 ON CONFLICT (day, type, method, staff) DO UPDATE SET n = n + excluded.n, total = total + excluded.total''', (after_id,))
+
+
+def record_expenses_since(c, after_id):
+    c.execute('''INSERT INTO expenses_daily (day, n, amount)
+                 SELECT substr(timestamp, 1, 10), COUNT(*), COALESCE(SUM(amount), 0) FROM expenses WHERE id > ? GROUP BY 1
+                 ON CONFLICT (day) DO UPDATE SET n = n + excluded.n, amount = amount + excluded.amount''', (after_id,))
+
+
+def rebuild(c, start_day=None, end_day=None):
+    """Recompute the rollups for [start_day, end_day] (whole history when omitted)."""
+    start_day = start_day or "0000-00-00"
+    end_day = end_day or "9999-99-99"
+    archived = ",".join(map(str, _archived_years(c)))
+    skip = f"AND CAST(substr({{}}, 1, 4) AS INTEGER) NOT IN ({archived})" if archived else ""
+    c.execute(f"DELETE FROM sales_daily WHERE day BETWEEN ? AND ? {skip.format('day')}", (start_day, end_day))
+    c.execute(f"DELETE FROM expenses_daily WHERE day BETWEEN ? AND ? {skip.format('day')}", (start_day, end_day))
+    c.execute(f'''INSERT INTO sales_daily (day, type, method, staff, n, total)
+                  SELECT substr(timestamp, 1, 10), COALESCE(type, ''), COALESCE(method, ''), COALESCE(staff, ''), COUNT(*), COALESCE(SUM(total), 0)
+                  FROM sales WHERE timestamp >= ? AND timestamp <= ? || '~' {skip.format('timestamp')}
+                  GROUP BY 1, 2, 3, 4''', (start_day, end_day))
+    c.execute(f'''INSERT INTO expenses_daily (day, n, amount)
+                  SELECT substr(timestamp, 1, 10), COUNT(*), COALESCE(SUM(amount), 0)
+                  FROM expenses WHERE timestamp >= ? AND timestamp <= ? || '~' {skip.format('timestamp')}
+                  GROUP BY 1''', (start_day, end_day))
+
+
+def _archived_years(c):
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='archives'").fetchone():
+        return []
+    return [r[0] for r in c.execute("SELECT DISTINCT year FROM archives").fetchall()]
+
+
+# --- READERS ---
+def totals(start_day, end_day):
+    """Revenue per sale type plus expenses for the inclusive day range."""
+    out = {"CAR WASH": 0.0, "LOUNGE": 0.0, "EXPENSES": 0.0}
+    for sale_type, total in db.fetchall(
+            "SELECT type, SUM(total) FROM sales_daily WHERE day BETWEEN ? AND ? GROUP BY type", (start_day, end_day)):
+        out[sale_type] = total or 0.0
+    out["EXPENSES"] = db.fetchone(
+        "SELECT COALESCE(SUM(amount), 0) FROM expenses_daily WHERE day BETWEEN ? AND ?", (start_day, end_day))[0]
+    return out
+
+
+def staff_performance(sale_type="CAR WASH"):
+    return db.query_df('''SELECT staff, SUM(n) as washes, SUM(total) as revenue FROM sales_daily
+                          WHERE type=? GROUP BY staff''', (sale_type,))
+
+
+if __name__ == "__main__":
+    import schema
+
+    parser = argparse.ArgumentParser(description="Rebuild/backfill the daily rollup tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    schema.bootstrap()
+    with db.write() as c:
+        rebuild(c, args.start, args.end)
+    print(f"rollups rebuilt for {args.start or 'start'} .. {args.end or 'end'}")
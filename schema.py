@@ -0,0 +1,196 @@
+import threading
+
+import archive
+import bays
+import board
+import cache
+import cards
+import checkout
+import customers
+import db
+import events
+import receipts
+import retention
+import rollups
+
+# --- VERSIONED MIGRATIONS ---
+# Each migration runs once, in order, inside its own write transaction, and the
+# database's PRAGMA user_version records the last one applied. Add new steps at the
+# end with the next number; never edit one that has shipped.
+MIGRATIONS = []
+
+
+def migration(version):
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+
+@migration(1)
+def _base_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (username TEXT PRIMARY KEY, password TEXT, role TEXT, dept TEXT, status TEXT DEFAULT 'ACTIVE')''')
+    c.execute('''CREATE TABLE IF NOT EXISTS customers
+                 (plate TEXT PRIMARY KEY, name TEXT, phone TEXT, visits INTEGER, last_visit TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS sales
+                 (id INTEGER PRIMARY KEY, plate TEXT, services TEXT, total REAL, method TEXT, staff TEXT, timestamp TEXT, type TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS notifications
+                 (id INTEGER PRIMARY KEY, message TEXT, timestamp TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS live_bays
+                 (plate TEXT PRIMARY KEY, status TEXT, entry_time TEXT, staff TEXT, vehicle_type TEXT, service_detail TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS inventory (item TEXT PRIMARY KEY, stock REAL, unit TEXT, price REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS wash_prices (service TEXT PRIMARY KEY, price REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY, description TEXT, amount REAL, timestamp TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS memberships
+                 (plate TEXT PRIMARY KEY, balance_washes INTEGER, card_type TEXT, sale_price REAL DEFAULT 0.0)''')
+
+    # Seed Admin and Initial Data
+    c.execute("INSERT OR IGNORE INTO users VALUES ('admin', '0000', 'MANAGER', 'MANAGEMENT', 'ACTIVE')")
+    c.execute("INSERT OR IGNORE INTO inventory VALUES ('Car Shampoo', 10.0, 'Gallons', 0), ('Coke', 50.0, 'Cans', 500), ('Water', 100.0, 'Bottles', 200)")
+    c.execute("SELECT COUNT(*) FROM wash_prices")
+    if c.fetchone()[0] == 0:
+        initial_services = [("Standard Wash", 5000), ("Executive Detail", 15000), ("Engine Steam", 10000), ("Ceramic Wax", 25000), ("Interior Deep Clean", 12000)]
+        c.executemany("INSERT INTO wash_prices VALUES (?,?)", initial_services)
+
+
+@migration(2)
+def _access_path_indexes(c):
+    # FINANCIALS date filters, Staff Performance (type + staff), the free-staff lookup,
+    # department dropdowns and the retention panel.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sales_timestamp ON sales(timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sales_type_staff ON sales(type, staff)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_live_bays_staff ON live_bays(staff)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_dept_status ON users(dept, status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customers_last_visit ON customers(last_visit)")
+    c.execute("ANALYZE")
+
+
+@migration(3)
+def _daily_rollups(c):
+    for stmt in rollups.DDL:
+        c.execute(stmt)
+    rollups.rebuild(c)
+
+
+@migration(4)
+def _normalize_timestamps(c):
+    # Older rows carry "%Y-%m-%d %H:%M" (sales) or "%Y-%m-%d" (expenses); pad both to
+    # db.TS_FMT so range filters compare like with like.
+    c.execute("UPDATE sales SET timestamp = timestamp || ':00' WHERE length(timestamp) = 16")
+    c.execute("UPDATE expenses SET timestamp = timestamp || ' 00:00:00' WHERE length(timestamp) = 10")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_timestamp ON expenses(timestamp)")
+
+
+@migration(5)
+def _customer_search_index(c):
+    customers.create_index(c)
+
+
+@migration(6)
+def _config_version(c):
+    c.execute(cache.META_DDL)
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('config_version', 0)")
+
+
+@migration(7)
+def _event_log(c):
+    for stmt in events.DDL:
+        c.execute(stmt)
+
+
+@migration(8)
+def _checkout_keys(c):
+    for stmt in checkout.DDL:
+        c.execute(stmt)
+
+
+@migration(9)
+def _live_bays_revision(c):
+    for stmt in board.DDL:
+        c.execute(stmt)
+
+
+@migration(10)
+def _sales_by_plate(c):
+    for stmt in retention.DDL:
+        c.execute(stmt)
+
+
+@migration(11)
+def _bay_lifecycle(c):
+    for stmt in bays.DDL:
+        c.execute(stmt)
+
+
+@migration(12)
+def _archive_registry(c):
+    for stmt in archive.DDL:
+        c.execute(stmt)
+
+
+@migration(13)
+def _card_ledger(c):
+    for stmt in cards.DDL:
+        c.execute(stmt)
+
+
+@migration(14)
+def _receipts(c):
+    for stmt in receipts.DDL:
+        c.execute(stmt)
+    receipts.backfill(c)
+
+
+@migration(15)
+def _normalize_plates(c):
+    # The till kept plates as typed while the importer stripped spaces; store one form.
+    customers.normalize_stored_plates(c)
+
+
+@migration(16)
+def _undated_card_amounts(c):
+    for stmt in cards.UNDATED_FIX:
+        c.execute(stmt)
+
+
+def current_version():
+    return db.fetchone("PRAGMA user_version")[0]
+
+
+def migrate():
+    applied = []
+    version = current_version()
+    for target, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if target <= version:
+            continue
+        with db.write() as c:
+            # Re-check under the write lock in case another process migrated meanwhile.
+            if c.execute("PRAGMA user_version").fetchone()[0] >= target:
+                continue
+            step(c)
+            c.execute(f"PRAGMA user_version = {int(target)}")
+        applied.append(target)
+    return applied
+
+
+# --- ONE-TIME BOOTSTRAP ---
+# Streamlit re-executes app.py on every interaction but imports this module once per
+# process, so the flag below keeps reruns free of DDL.
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+def bootstrap():
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if not _bootstrapped:
+            migrate()
+            _bootstrapped = True
+
+
+if __name__ == "__main__":
+    done = migrate()
+    print(f"schema at version {current_version()}" + (f" (applied {done})" if done else ""))
@@ -0,0 +1,188 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import cache
+import db
+import receipts
+import rollups
+import schema
+
+# --- SYNTHETIC DATA GENERATOR ---
+# Fills a database with plausible shop history so pages can be measured at production
+# sizes before they fail in the shop. Everything is written with executemany in one
+# transaction per table, then the derived tables (rollups, receipts, visit counts) are
+# rebuilt set-based.
+FIRST_NAMES = ["Ade", "Bola", "Chika", "Dayo", "Emeka", "Funke", "Gbenga", "Halima", "Ifeoma", "Jide",
+               "Kemi", "Lanre", "Musa", "Ngozi", "Obi", "Segun", "Tolu", "Uche", "Yemi", "Zainab"]
+LAST_NAMES = ["Adeyemi", "Bello", "Okafor", "Eze", "Ibrahim", "Johnson", "Nwosu", "Ogunleye", "Sanni", "Usman"]
+PLATE_PREFIXES = ["KJA", "LSR", "EKY", "AAA", "GGE", "FKJ", "SMK", "APP", "LND", "BDG"]
+VEHICLES = ["Sedan", "SUV", "Truck", "Crossover", "Bike", "Other"]
+METHODS = ["Moniepoint POS", "Bank Transfer", "Cash", "Gold Card Credit"]
+METHOD_WEIGHTS = [45, 30, 20, 5]
+TIERS = [("Silver (5 Washes)", 5, 20000), ("Gold (10 Washes)", 10, 40000), ("Platinum (25 Washes)", 25, 90000)]
+EXPENSES = ["Car Shampoo restock", "Diesel for generator", "Staff lunch", "Water bill", "Microfiber towels", "Repairs"]
+
+
+def _plate(rng):
+    return f"{rng.choice(PLATE_PREFIXES)}-{rng.randint(100, 999)}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}"
+
+
+def _phone(rng):
+    return f"234{rng.choice(['803', '805', '806', '810', '813', '816', '703', '706', '901'])}{rng.randint(0, 9999999):07d}"
+
+
+def seed(years=1, sales_per_day=40, customers=2000, memberships=300, expenses_per_day=2,
+         notifications_per_day=40, live_bays=10, staff=None, rng_seed=42):
+    rng = random.Random(rng_seed)
+    schema.bootstrap()
+    counts = {}
+    staff = staff or max(12, live_bays + 6)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=int(365 * years))
+    days = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+
+    # Staff: roughly half wet bay, half dry bay, plus a couple of receptionists.
+    wet = [f"wet_{i:02d}" for i in range(staff // 2)]
+    dry = [f"dry_{i:02d}" for i in range(staff - staff // 2)]
+    users = [(u, "1234", "STAFF", "WET BAY", "ACTIVE") for u in wet] + \
+            [(u, "1234", "STAFF", "DRY BAY", "ACTIVE") for u in dry] + \
+            [("front_desk", "1234", "STAFF", "RECEPTIONIST", "ACTIVE")]
+
+    plates = list({_plate(rng) for _ in range(int(customers * 1.1))})[:customers]
+    people = {p: (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", _phone(rng)) for p in plates}
+
+    with db.write() as c:
+        c.executemany("INSERT OR REPLACE INTO users (username, password, role, dept, status) VALUES (?,?,?,?,?)", users)
+        cache.bump(c)
+        services = dict(c.execute("SELECT service, price FROM wash_prices").fetchall())
+        lounge = dict(c.execute("SELECT item, price FROM inventory WHERE price > 0").fetchall())
+        c.execute("UPDATE inventory SET stock = stock + 100000")
+    counts["users"] = len(users)
+
+    # Sales: mostly car washes, some lounge tabs, spread across opening hours.
+    sales = []
+    for day in days:
+        for _ in range(max(0, int(rng.gauss(sales_per_day, sales_per_day * 0.2)))):
+            ts = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(7 * 60, 20 * 60))
+            if ts > end:
+                continue
+            method = rng.choices(METHODS, METHOD_WEIGHTS)[0]
+            if rng.random() < 0.8:
+                picked = rng.sample(list(services), rng.randint(1, min(2, len(services))))
+                total = 0.0 if method == "Gold Card Credit" else float(sum(services[s] for s in picked))
+                sales.append((rng.choice(plates), ", ".join(picked), total, method, rng.choice(wet), ts.strftime(db.TS_FMT), "CAR WASH"))
+            else:
+                item, qty = rng.choice(list(lounge)), rng.randint(1, 3)
+                method = method if method != "Gold Card Credit" else "Cash"
+                sales.append(("", f"{item} (x{qty})", float(lounge[item] * qty), method, "front_desk", ts.strftime(db.TS_FMT), "LOUNGE"))
+    sales.sort(key=lambda r: r[5])
+    expenses = [(rng.choice(EXPENSES), float(rng.randint(5, 200) * 100),
+                 (datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(8, 18))).strftime(db.TS_FMT))
+                for day in days for _ in range(rng.randint(0, expenses_per_day * 2))]
+
+    with db.write() as c:
+        c.executemany("INSERT INTO sales (plate, services, total, method, staff, timestamp, type) VALUES (?,?,?,?,?,?,?)", sales)
+        c.executemany("INSERT INTO expenses (description, amount, timestamp) VALUES (?,?,?)", expenses)
+        # Customers carry their visit count and last visit, derived from the sales just written.
+        c.executemany("INSERT OR IGNORE INTO customers (plate, name, phone, visits, last_visit) VALUES (?,?,?,0,NULL)",
+                      [(p, n, ph) for p, (n, ph) in people.items()])
+        c.execute('''UPDATE customers SET (visits, last_visit) =
+                         (SELECT COUNT(*), substr(MAX(timestamp), 1, 10) FROM sales WHERE sales.plate = customers.plate)
+                     WHERE plate IN (SELECT DISTINCT plate FROM sales WHERE plate != '')''')
+        rollups.rebuild(c)
+        receipts.backfill(c)
+    counts.update(sales=len(sales), expenses=len(expenses), customers=len(people))
+
+    # Cards: each sold on a random day, with its used washes redeemed afterwards in the ledger.
+    cards, ledger = [], []
+    for p in rng.sample(plates, min(memberships, len(plates))):
+        tier, washes, price = rng.choice(TIERS)
+        left = rng.randint(0, washes)
+        issued = datetime.combine(rng.choice(days), datetime.min.time()) + timedelta(hours=rng.randint(8, 18))
+        ledger.append((p, "ISSUE", washes, float(price), tier, issued.strftime(db.TS_FMT)))
+        used = issued
+        for _ in range(washes - left):
+            used = min(used + timedelta(days=rng.randint(1, 20)), end)
+            ledger.append((p, "REDEEM", -1, 0.0, tier, used.strftime(db.TS_FMT)))
+        cards.append((p, left, tier, float(price), issued.strftime(db.TS_FMT),
+                      used.strftime(db.TS_FMT) if used > issued else None))
+    ledger.sort(key=lambda r: r[5])
+    notes = []
+    for day in days:
+        for _ in range(notifications_per_day):
+            ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(7 * 3600, 20 * 3600))
+            kind = rng.choice(["SALE", "SALE", "HANDOVER", "RELEASE", "CARD"])
+            hms = ts.strftime("%H:%M:%S")
+            notes.append((f"{hms} | {kind} {rng.choice(plates)}", hms, ts.strftime(db.TS_FMT), kind))
+    notes.sort(key=lambda r: r[2])
+    live = []
+    for i, p in enumerate(rng.sample(plates, min(live_bays, len(plates)))):
+        in_dry = i % 2 == 1 and i // 2 < len(dry)
+        detailer = dry[i // 2] if in_dry else wet[i % len(wet)]
+        entered = end - timedelta(minutes=rng.randint(5, 90))
+        live.append((p, "DRY BAY" if in_dry else "WET BAY", entered.strftime(db.TS_FMT), detailer,
+                     rng.choice(VEHICLES), rng.choice(list(services)), entered.strftime(db.TS_FMT)))
+
+    with db.write() as c:
+        c.executemany("INSERT OR REPLACE INTO memberships (plate, balance_washes, card_type, sale_price, issued, last_used) VALUES (?,?,?,?,?,?)", cards)
+        c.executemany("INSERT INTO card_ledger (plate, event, washes, amount, card_type, ts) VALUES (?,?,?,?,?,?)", ledger)
+        c.executemany("INSERT INTO notifications (message, timestamp, ts, kind) VALUES (?,?,?,?)", notes)
+        c.executemany('''INSERT OR REPLACE INTO live_bays (plate, status, entry_time, staff, vehicle_type, service_detail, stage_time)
+                         VALUES (?,?,?,?,?,?,?)''', live)
+    counts.update(memberships=len(cards), card_ledger=len(ledger), notifications=len(notes), live_bays=len(live))
+
+    # Bay history for every past car wash, with the cycle-time aggregates folded in Python.
+    bay_events, stats = [], {}
+    for plate, service_detail, _, _, wet_staff, ts, sale_type in sales:
+        if sale_type != "CAR WASH":
+            continue
+        entered = datetime.strptime(ts, db.TS_FMT)
+        wet_secs = max(300.0, rng.gauss(20 * 60, 6 * 60))
+        dry_secs = max(300.0, rng.gauss(15 * 60, 5 * 60))
+        dry_staff = rng.choice(dry)
+        vehicle = rng.choice(VEHICLES)
+        handed = entered + timedelta(seconds=wet_secs)
+        released = handed + timedelta(seconds=dry_secs)
+        bay_events += [(plate, "ENTER", wet_staff, service_detail, vehicle, ts),
+                       (plate, "HANDOVER", dry_staff, service_detail, vehicle, handed.strftime(db.TS_FMT)),
+                       (plate, "RELEASE", dry_staff, service_detail, vehicle, released.strftime(db.TS_FMT))]
+        hour = f"{entered.hour:02d}:00"
+        services_done = [s.strip() for s in service_detail.split(",")]
+        for stage, secs, who in (("WET", wet_secs, wet_staff), ("DRY", dry_secs, dry_staff), ("TOTAL", wet_secs + dry_secs, None)):
+            keys = [("hour", hour)] + [("service", s) for s in services_done] + ([("staff", who)] if who else [])
+            for dim, key in keys:
+                agg = stats.setdefault((dim, key, stage), [0, 0.0, 0.0])
+                agg[0] += 1
+                agg[1] += secs
+                agg[2] = max(agg[2], secs)
+    with db.write() as c:
+        c.executemany("INSERT INTO bay_events (plate, event, staff, service_detail, vehicle_type, ts) VALUES (?,?,?,?,?,?)", bay_events)
+        c.executemany("INSERT OR REPLACE INTO bay_cycle_stats (dim, key, stage, n, total_secs, max_secs) VALUES (?,?,?,?,?,?)",
+                      [(dim, key, stage, n, total, worst) for (dim, key, stage), (n, total, worst) in stats.items()])
+    counts["bay_events"] = len(bay_events)
+
+    with db.write() as c:
+        c.execute("ANALYZE")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a RideBoss database with synthetic data.")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file to fill (default: %(default)s)")
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--sales-per-day", type=int, default=40)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--memberships", type=int, default=300)
+    parser.add_argument("--expenses-per-day", type=int, default=2)
+    parser.add_argument("--notifications-per-day", type=int, default=40)
+    parser.add_argument("--live-bays", type=int, default=10)
+    parser.add_argument("--staff", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    db.configure(args.db)
+    t0 = time.perf_counter()
+    counts = seed(args.years, args.sales_per_day, args.customers, args.memberships, args.expenses_per_day,
+                  args.notifications_per_day, args.live_bays, args.staff, args.seed)
+    print(f"seeded {args.db} in {time.perf_counter() - t0:.1f}s: " + ", ".join(f"{k}={v:,}" for k, v in counts.items()))